@@ -1,5 +1,6 @@
 from google.adk.agents import Agent
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from datetime import date, timedelta
 
 
 from dotenv import load_dotenv
@@ -230,12 +231,18 @@ def suggest_ticker(
     engine = create_engine(
         f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     )
-    query = """
+    # chỉ lấy đủ số phiên cho SMA dài nhất (~2 ngày lịch / phiên + nghỉ lễ)
+    # → bảng partition theo tháng chỉ quét vài partition gần nhất
+    lookback_days = 2 * (long_window + last_n_sessions) + 14
+    since = (date.today() - timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+
+    query = text("""
     SELECT *
     FROM warehouse.warehouse_prices_1d
-    """
+    WHERE date >= :since
+    """)
 
-    df = pd.read_sql(query, engine)
+    df = pd.read_sql(query, engine, params={"since": since})
     df['date'] = pd.to_datetime(df['date'])
     df = df.sort_values(['ticker', 'date'])
 
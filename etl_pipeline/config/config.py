@@ -10,7 +10,20 @@ MINIO_CONFIG = {
     "endpoint": os.getenv("MINIO_ENDPOINT"),
     "bucket_name": os.getenv("DATALAKE_BUCKET"),
     "access_key": os.getenv("MINIO_ACCESS_KEY"),
-    "secret_key": os.getenv("MINIO_SECRET_KEY")
+    "secret_key": os.getenv("MINIO_SECRET_KEY"),
+    # số partition download/decode song song khi load_all_partitions
+    "load_concurrency": int(os.getenv("MINIO_LOAD_CONCURRENCY", 8)),
+    # cache đọc Parquet trên đĩa local (key = object + ETag), LRU theo byte
+    "cache_dir": os.getenv("MINIO_CACHE_DIR", "/tmp/etl_pipeline/minio_cache"),
+    "cache_max_bytes": int(os.getenv("MINIO_CACHE_MAX_BYTES", 2 * 1024 ** 3)),
+    # số dòng / row group khi ghi Parquet (dữ liệu được sort theo ticker)
+    "row_group_size": int(os.getenv("MINIO_ROW_GROUP_SIZE", 50_000)),
+    # ghi nhiều partition một lượt (write_partitions)
+    "write_concurrency": int(os.getenv("MINIO_WRITE_CONCURRENCY", 8)),
+    "max_in_flight_bytes": int(os.getenv("MINIO_MAX_IN_FLIGHT_BYTES", 256 * 1024 ** 2)),
+    # file khoá (flock) cho read-modify-write manifest / activity / _latest,
+    # dùng chung giữa các run song song trên host
+    "lock_dir": os.getenv("MINIO_LOCK_DIR", "/tmp/etl_pipeline/locks"),
 }
 
 # PostgreSQL config
@@ -20,6 +33,46 @@ PSQL_CONFIG = {
     "database": os.getenv("POSTGRES_DB"),
     "user": os.getenv("POSTGRES_USER"),
     "password": os.getenv("POSTGRES_PASSWORD"),
+    # số dòng / lần COPY FROM STDIN khi load vào warehouse
+    "copy_chunk_rows": int(os.getenv("POSTGRES_COPY_CHUNK_ROWS", 100_000)),
+    # connection pool dùng chung cho mọi lần load trong process
+    "pool_size": int(os.getenv("POSTGRES_POOL_SIZE", 5)),
+    "max_overflow": int(os.getenv("POSTGRES_MAX_OVERFLOW", 5)),
+    # số dòng / chunk khi đọc warehouse bằng server-side cursor
+    "read_chunk_rows": int(os.getenv("POSTGRES_READ_CHUNK_ROWS", 50_000)),
+}
+
+# vnstock API (source VCI)
+VNSTOCK_CONFIG = {
+    # số ticker gọi song song
+    "max_workers": int(os.getenv("VNSTOCK_MAX_WORKERS", 4)),
+    # token bucket: request / giây + burst cho cả host, chỉnh theo gói API đang dùng
+    "rate_per_sec": float(os.getenv("VNSTOCK_RATE_PER_SEC", 1.0)),
+    "burst": int(os.getenv("VNSTOCK_BURST", 5)),
+    # file SQLite giữ bucket chung cho mọi run trên host (rỗng → chỉ trong process)
+    "rate_limit_db": os.getenv(
+        "VNSTOCK_RATE_LIMIT_DB", "/tmp/etl_pipeline/vnstock_rate_limit.sqlite"
+    ),
+    # retry: exponential backoff base * 2^n (giây), tối đa backoff_max
+    "max_retries": int(os.getenv("VNSTOCK_MAX_RETRIES", 6)),
+    "backoff_base": float(os.getenv("VNSTOCK_BACKOFF_BASE", 2.0)),
+    "backoff_max": float(os.getenv("VNSTOCK_BACKOFF_MAX", 60.0)),
+    # snapshot universe (danh sách mã + VN30/VN100/HNX30 + ngành), làm mới sau TTL
+    "universe_path": os.getenv(
+        "VNSTOCK_UNIVERSE_PATH", "/tmp/etl_pipeline/universe.parquet"
+    ),
+    "universe_ttl_hours": float(os.getenv("VNSTOCK_UNIVERSE_TTL_HOURS", 24)),
+    # full load: số ticker mỗi lô ghi staging + checkpoint
+    "checkpoint_batch": int(os.getenv("VNSTOCK_CHECKPOINT_BATCH", 100)),
+}
+
+# record / replay HTTP (vnstock + crawler) để benchmark offline
+HTTP_CASSETTE_CONFIG = {
+    # off | record | replay | auto
+    "mode": os.getenv("HTTP_CASSETTE_MODE", "off"),
+    "dir": os.getenv("HTTP_CASSETTE_DIR", "/tmp/etl_pipeline/http_cassettes"),
+    # độ trễ khi replay: số ms, hoặc "recorded" = đúng thời gian lúc record
+    "latency_ms": os.getenv("HTTP_CASSETTE_LATENCY_MS", "0"),
 }
 
 print(MINIO_CONFIG)
\ No newline at end of file
@@ -1,7 +1,8 @@
 from datetime import datetime, timedelta, timezone
 import pandas as pd
 from dagster import asset, Output
-from etl_pipeline.ops.api.company_info import get_company_information, get_stock_list
+from etl_pipeline.ops.api.company_info import get_company_information
+from etl_pipeline.ops.api.universe import get_stock_list
 
 def bronze_company_info(info_type: str):
     @asset(
@@ -1,6 +1,8 @@
 import pandas as pd
-from etl_pipeline.ops.api.prices import get_prices, get_stock_list
-from dagster import asset, DailyPartitionsDefinition, Output
+from etl_pipeline.ops.api.prices import get_prices
+from etl_pipeline.ops.api.checkpoint import fetch_with_checkpoint
+from etl_pipeline.ops.api.universe import get_stock_list
+from dagster import asset, BackfillPolicy, DailyPartitionsDefinition, Output, MetadataValue
 from datetime import date, timedelta, timezone, datetime
 
 VN_TZ = timezone(timedelta(hours=7))
@@ -24,11 +26,23 @@ def detect_inactive_symbols(
 
     recent_partitions = existing_partitions[-lookback:]
 
-    active = set()
-    for p in recent_partitions:
-        df = io.load_partition(asset_key, p)
-        # union các mã có ít nhất 1 phiên khớp lệnh trong 10 phiên gần nhất  
-        active |= set(df["ticker"].unique())
+    activity = io.read_activity(asset_key)
+    if activity is None:
+        # chưa có activity index → quét các partition gần nhất 1 lần rồi seed index
+        activity = io.update_activity(
+            asset_key,
+            "ticker",
+            {
+                p: io.load_partition(asset_key, p, columns=["ticker"])["ticker"].unique()
+                for p in recent_partitions
+            },
+        )
+
+    # các mã có ít nhất 1 phiên khớp lệnh trong 10 phiên gần nhất
+    active = {
+        t for t, last_seen in activity["last_seen"].items()
+        if last_seen >= recent_partitions[0]
+    }
 
     inactive = all_tickers - active
     return inactive
@@ -54,59 +68,145 @@ def build_tickers(*, all_tickers: set[str], inactive: set[str] | None = None) ->
 
     return stocks + indices
 
+def missing_trading_days(partition_keys, existing_partitions) -> list[str]:
+    """
+    Các partition trong cửa sổ backfill chưa có trên MinIO (bỏ cuối tuần).
+    """
+    existing = set(existing_partitions)
+    return sorted(
+        pk for pk in partition_keys
+        if pk not in existing
+        and datetime.strptime(pk, "%Y-%m-%d").weekday() < 5
+    )
+
+def split_daily(df: pd.DataFrame, keep: set[str] | None = None):
+    """
+    (partition_key, frame) theo từng ngày, để ghi qua write_partitions.
+    Cột `date` ghi dạng string "YYYY-MM-DD" giống nhánh incremental, để
+    mọi partition ngày cùng schema.
+    """
+    df = df.rename(columns={"time": "date"})
+    df["date"] = pd.to_datetime(df["date"])
+    for t, df_part in df.groupby("date"):
+        pk = t.strftime("%Y-%m-%d")
+        if keep is None or pk in keep:
+            yield pk, df_part.assign(date=pk)
+
+def range_backfill(context, io, asset_key, all_tickers, existing_partitions):
+    """
+    Backfill nhiều ngày trong 1 run: mỗi ticker gọi API 1 lần cho cả cửa
+    sổ [ngày thiếu đầu tiên, ngày thiếu cuối cùng], rồi tách ra partition
+    ngày. Số request ~ số ticker thay vì ticker × ngày.
+    """
+    missing = missing_trading_days(context.partition_keys, existing_partitions)
+    context.log.info(
+        f"RANGE BACKFILL MODE | window={context.partition_keys[0]}..{context.partition_keys[-1]} "
+        f"missing={len(missing)}"
+    )
+    if not missing:
+        context.log.info("No missing partitions in window")
+        return
+
+    # không lọc inactive: cửa sổ có thể nằm trước lúc mã ngừng giao dịch
+    tickers = build_tickers(all_tickers=all_tickers)
+    df = get_prices(
+        context=context,
+        interval='1d',
+        tickers=tickers,
+        start_date=missing[0],
+        end_date=missing[-1],
+    )
+    if df.empty:
+        context.log.warning("No data fetched for window")
+        return
+
+    written = io.write_partitions(
+        asset_key,
+        split_daily(df, keep=set(missing)),
+        log=context.log,
+        activity_column="ticker",
+    )
+
+    context.log.info(
+        "Range backfill done\n"
+        f"Tickers={len(tickers)}\n"
+        f"Rows={len(df)}\n"
+        f"Partitions_written={len(written)}/{len(missing)}\n"
+        f"Fetch_stats={df.attrs.get('fetch_stats', {})}"
+    )
+
 @asset(
     key_prefix=["bronze", "prices"],
     partitions_def=daily,
     io_manager_key="minio_io_manager",
     group_name="bronze",
+    # backfill nhiều ngày chạy trong 1 run → range_backfill
+    backfill_policy=BackfillPolicy.single_run(),
+    # IO manager cập nhật _activity.json theo cột này khi ghi partition
+    metadata={"activity_column": "ticker"},
 )
 def bronze_prices_1d(context):
-    dates = context.partition_key
-
     io = context.resources.minio_io_manager
     asset_key = context.asset_key
-    existing_partitions = io.list_partitions(asset_key)
 
     all_tickers = set(get_stock_list())
     all_tickers |= INDEX_TICKERS
 
-    # Full load mode (lần chạy đầu tiên)
-    if not existing_partitions:
-        context.log.info("FULL LOAD MODE")
+    # giữ khoá suốt full load: run song song đến sau chờ ở đây, xong thì
+    # thấy partition đã có → chuyển sang backfill / incremental
+    with io.full_load_lock(asset_key):
+        existing_partitions = io.list_partitions(asset_key)
 
-        df = get_prices(
-            context=context,
-            interval='1d',
-            tickers=build_tickers(all_tickers=all_tickers),
-            start_date = "2020-01-01",
-            end_date = date.today().strftime("%Y-%m-%d"),
-        )
+        # Full load mode (lần chạy đầu tiên, hoặc full load trước đó chưa xong)
+        checkpoint = io.read_checkpoint(asset_key)
+        if not existing_partitions or checkpoint is not None:
+            context.log.info("FULL LOAD MODE" + (" (resume)" if checkpoint else ""))
 
-        df["time"] = pd.to_datetime(df["time"])
-        df = df[df["time"] >= pd.Timestamp("2020-01-01")]
-        df = df.rename(columns={
-            'time': 'date'
-        })
-
-        # ghi toàn bộ lịch sử thành parquet partitions
-        for t, df_part in df.groupby("date"):
-            p = t.strftime("%Y-%m-%d")
-            io.write_partition(asset_key, p, df_part)
-
-        # partition hiện tại không cần ghi thêm
-        context.log.info("Full load done, skip partition materialization")
-        context.log.info(
-            "Full load done, skip partition materialization\n"
-            f"Tickers={len(all_tickers)}\n"
-            f"Rows={len(df)}\n"
-            f"Partitions_written="
-            f"{df[['date']].drop_duplicates().shape[0]}"
-        )
+            df = fetch_with_checkpoint(
+                context=context,
+                io=io,
+                asset_key=asset_key,
+                tickers=build_tickers(all_tickers=all_tickers),
+                fetch=lambda batch: get_prices(
+                    context=context,
+                    interval='1d',
+                    tickers=batch,
+                    start_date = "2020-01-01",
+                    end_date = date.today().strftime("%Y-%m-%d"),
+                ),
+            )
+
+            df["time"] = pd.to_datetime(df["time"])
+            df = df[df["time"] >= pd.Timestamp("2020-01-01")]
+
+            # ghi toàn bộ lịch sử thành parquet partitions (song song, 1 lần manifest)
+            written = io.write_partitions(
+                asset_key,
+                split_daily(df),
+                log=context.log,
+                activity_column="ticker",
+            )
+            # partition đã ghi xong → bỏ staging + checkpoint
+            io.clear_staging(asset_key)
 
+            # partition hiện tại không cần ghi thêm
+            context.log.info(
+                "Full load done, skip partition materialization\n"
+                f"Tickers={len(all_tickers)}\n"
+                f"Rows={len(df)}\n"
+                f"Partitions_written={len(written)}"
+            )
+
+            return
+
+    # Range backfill mode (run gồm nhiều partition)
+    if len(context.partition_keys) > 1:
+        range_backfill(context, io, asset_key, all_tickers, existing_partitions)
         return
 
     # Incremental mode
     context.log.info("INCREMENTAL MODE")
+    dates = context.partition_key
     d = datetime.strptime(dates, "%Y-%m-%d").date()
     if d.weekday() >= 5:
         context.log.info(f"No data for weekends: {dates}")
@@ -142,6 +242,7 @@ def bronze_prices_1d(context):
         start_date=dates,
         end_date=dates,
     )
+    fetch_stats = df.attrs.get("fetch_stats", {})
     df["time"] = df["time"].dt.strftime("%Y-%m-%d")
 
     df_part = df[
@@ -159,5 +260,6 @@ def bronze_prices_1d(context):
             "tickers_crawled": len(tickers),
             "rows": len(df_part),
             "api_called": True,
+            "fetch_stats": MetadataValue.json(fetch_stats),
         },
     )
@@ -0,0 +1,128 @@
+import pandas as pd
+from etl_pipeline.ops.api.prices import get_prices
+from etl_pipeline.ops.api.universe import load_universe
+from etl_pipeline.assets.bronze.prices import INDEX_TICKERS
+from dagster import asset, DailyPartitionsDefinition, Output, MetadataValue
+from datetime import datetime, time, timedelta, timezone
+
+VN_TZ = timezone(timedelta(hours=7))
+daily_5m = DailyPartitionsDefinition(
+    start_date="2026-01-01",
+    timezone="Asia/Ho_Chi_Minh",
+    end_offset=1,
+)
+
+# phiên khớp lệnh sáng / chiều; ngoài các khung này giá không đổi
+SESSIONS = [(time(9, 0), time(11, 30)), (time(13, 0), time(14, 45))]
+# hết phiên (sau ATC 14:45 + thoả thuận tới 15:00) → compact log trong ngày
+MARKET_CLOSE = time(15, 0)
+UNIQUE_KEY = ["ticker", "time"]
+
+def intraday_tickers() -> list[str]:
+    """
+    Poll 5 phút/lần nên chỉ lấy VN100 + chỉ số (~100 request / lượt),
+    không phải toàn bộ ~1.700 mã.
+    """
+    universe = load_universe()
+    stocks = sorted(universe.loc[universe["is_vn100"], "ticker"])
+    return stocks + sorted(INDEX_TICKERS)
+
+def new_bars(df: pd.DataFrame, latest: pd.DataFrame) -> pd.DataFrame:
+    """
+    Chỉ giữ bar từ bar cuối đã ghi của từng ticker trở đi (append-only).
+    Bar cuối lúc poll trước có thể chưa đóng (OHLCV còn đổi) → ghi lại;
+    compact_intraday / update_latest giữ bản mới nhất theo (ticker, time).
+    """
+    if latest.empty:
+        return df
+
+    last_time = latest.set_index("ticker")["time"]
+    seen = df["ticker"].map(last_time)
+    return df[seen.isna() | (df["time"] >= seen)]
+
+@asset(
+    key_prefix=["bronze", "prices"],
+    partitions_def=daily_5m,
+    io_manager_key="minio_io_manager",
+    group_name="bronze",
+)
+def bronze_prices_5m(context):
+    """
+    Bar 5 phút theo ngày.
+    - Trong phiên: mỗi lần poll ghi thêm 1 micro-batch vào _intraday/
+      và cập nhật _latest.parquet (bar mới nhất từng ticker).
+    - Sau 15:00: gộp log thành partition ngày.
+    - Backfill ngày cũ chưa có log: lấy lịch sử 5m của ngày đó rồi gộp.
+    """
+    io = context.resources.minio_io_manager
+    asset_key = context.asset_key
+    day_str = context.partition_key
+
+    now = datetime.now(VN_TZ)
+    is_today = day_str == now.strftime("%Y-%m-%d")
+    closed = not is_today or now.time() >= MARKET_CLOSE
+    in_session = any(start <= now.time() <= end for start, end in SESSIONS)
+
+    # -------- Poll --------
+    appended = 0
+    if is_today and (in_session or closed):
+        tickers = intraday_tickers()
+        df = get_prices(
+            context=context,
+            interval='5m',
+            tickers=tickers,
+            start_date=day_str,
+            end_date=day_str,
+        )
+
+        if not df.empty:
+            df["time"] = pd.to_datetime(df["time"])
+            df = new_bars(df, io.read_latest(asset_key))
+
+        if not df.empty:
+            io.append_intraday(asset_key, day_str, df)
+            io.update_latest(asset_key, df, key="ticker", time_column="time")
+            appended = len(df)
+
+        context.log.info(f"Appended {appended} new bars ({len(tickers)} tickers)")
+
+    elif is_today:
+        # trước giờ mở cửa / nghỉ trưa: không có bar mới
+        context.log.info(f"Outside session hours ({now:%H:%M}), skip poll")
+
+    # -------- Backfill: ngày cũ chưa có log → lấy lịch sử 5m cả ngày --------
+    elif not io.list_intraday(asset_key, day_str):
+        tickers = intraday_tickers()
+        df = get_prices(
+            context=context,
+            interval='5m',
+            tickers=tickers,
+            start_date=day_str,
+            end_date=day_str,
+        )
+
+        if not df.empty:
+            df["time"] = pd.to_datetime(df["time"])
+            # ghi thành 1 batch rồi compact như lúc đóng phiên
+            io.append_intraday(asset_key, day_str, df)
+            appended = len(df)
+
+        context.log.info(f"Backfilled {appended} bars ({len(tickers)} tickers)")
+
+    # -------- Close: compact --------
+    if not closed:
+        context.add_output_metadata({"mode": "poll", "bars_appended": appended})
+        return
+
+    entry = io.compact_intraday(
+        asset_key,
+        day_str,
+        unique_key=UNIQUE_KEY,
+        sort_by=UNIQUE_KEY,
+        log=context.log,
+    )
+    context.add_output_metadata({
+        "mode": "close",
+        "bars_appended": appended,
+        "partition": MetadataValue.json(entry or {}),
+    })
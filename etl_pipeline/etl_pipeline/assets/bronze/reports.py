@@ -1,5 +1,7 @@
 import pandas as pd
-from etl_pipeline.ops.api.reports import get_report, get_stock_list
+from etl_pipeline.ops.api.reports import get_report
+from etl_pipeline.ops.api.checkpoint import fetch_with_checkpoint
+from etl_pipeline.ops.api.universe import get_stock_list
 from dagster import asset, StaticPartitionsDefinition, Output
 from datetime import date
 
@@ -44,11 +46,23 @@ def detect_inactive_symbols(
 
     recent_partitions = existing_partitions[-lookback:]
 
-    active = set()
-    for p in recent_partitions:
-        df = io.load_partition(asset_key, p)
-        # union các mã có ít nhất 1 bctc trong 4 quý gần nhất  
-        active |= set(df["CP"].unique())
+    activity = io.read_activity(asset_key)
+    if activity is None:
+        # chưa có activity index → quét các partition gần nhất 1 lần rồi seed index
+        activity = io.update_activity(
+            asset_key,
+            "CP",
+            {
+                p: io.load_partition(asset_key, p, columns=["CP"])["CP"].unique()
+                for p in recent_partitions
+            },
+        )
+
+    # các mã có ít nhất 1 bctc trong 4 quý gần nhất
+    active = {
+        t for t, last_seen in activity["last_seen"].items()
+        if last_seen >= recent_partitions[0]
+    }
 
     inactive = all_tickers - active
     return inactive
@@ -69,42 +83,61 @@ def bronze_reports(report_type: str):
         partitions_def=report_partitions,
         io_manager_key="minio_io_manager",
         group_name="bronze",
+        # IO manager cập nhật _activity.json theo cột này khi ghi partition
+        metadata={"activity_column": "CP"},
     )
     def _asset(context):
         io = context.resources.minio_io_manager
         asset_key = context.asset_key
 
-        existing_partitions = io.list_partitions(asset_key)
         year, quarter = map(int, context.partition_key.split("-Q"))
 
         all_tickers = set(get_stock_list())
 
-        # Full load mode (lần chạy đầu tiên)
-        if not existing_partitions:
-            context.log.info("FULL LOAD MODE")
-
-            df = get_report(
-                context=context,
-                report_type=report_type,
-                tickers=sorted(all_tickers),
-            )
-
-            # ghi toàn bộ lịch sử thành parquet partitions
-            for (y, q), df_q in df.groupby(["Năm", "Kỳ"]):
-                p = f"{y}-Q{q}"
-                if p in quarters:
-                    io.write_partition(asset_key, p, df_q)
-
-            # partition hiện tại không cần ghi thêm
-            context.log.info("Full load done, skip partition materialization")
-            context.log.info(
-                "Full load done, skip partition materialization\n"
-                f"Tickers={len(all_tickers)}\n"
-                f"Rows={len(df)}\n"
-                f"Partitions_written="
-                f"{df[['Năm', 'Kỳ']].drop_duplicates().shape[0]}"
-            )
-            return
+        # giữ khoá suốt full load: các partition chạy song song đến sau chờ
+        # ở đây, xong thì thấy partition đã có → chuyển sang incremental
+        with io.full_load_lock(asset_key):
+            existing_partitions = io.list_partitions(asset_key)
+
+            # Full load mode (lần chạy đầu tiên, hoặc full load trước đó chưa xong)
+            checkpoint = io.read_checkpoint(asset_key)
+            if not existing_partitions or checkpoint is not None:
+                context.log.info("FULL LOAD MODE" + (" (resume)" if checkpoint else ""))
+
+                df = fetch_with_checkpoint(
+                    context=context,
+                    io=io,
+                    asset_key=asset_key,
+                    tickers=sorted(all_tickers),
+                    fetch=lambda batch: get_report(
+                        context=context,
+                        report_type=report_type,
+                        tickers=batch,
+                    ),
+                )
+
+                # ghi toàn bộ lịch sử thành parquet partitions (song song, 1 lần manifest)
+                written = io.write_partitions(
+                    asset_key,
+                    (
+                        (f"{y}-Q{q}", df_q)
+                        for (y, q), df_q in df.groupby(["Năm", "Kỳ"])
+                        if f"{y}-Q{q}" in quarters
+                    ),
+                    log=context.log,
+                    activity_column="CP",
+                )
+                # partition đã ghi xong → bỏ staging + checkpoint
+                io.clear_staging(asset_key)
+
+                # partition hiện tại không cần ghi thêm
+                context.log.info(
+                    "Full load done, skip partition materialization\n"
+                    f"Tickers={len(all_tickers)}\n"
+                    f"Rows={len(df)}\n"
+                    f"Partitions_written={len(written)}"
+                )
+                return
 
 
         # Incremental mode
@@ -0,0 +1,34 @@
+from dagster import asset, Output, MetadataValue
+from etl_pipeline.ops.api.universe import load_universe
+
+@asset(
+    key_prefix=["bronze"],
+    io_manager_key="minio_io_manager",
+    compute_kind="python",
+    group_name="bronze",
+)
+def bronze_universe(context):
+    """
+    Danh sách mã + sàn, VN30/VN100/HNX30, ngành ICB (làm mới mỗi ngày).
+
+    load_universe(refresh=True) ghi lại snapshot local để các asset
+    crawl / normalize trong ngày đọc từ đó, không gọi Listing API.
+    """
+    df = load_universe(refresh=True)
+    version = str(df["date_fetched"].max())
+
+    context.log.info(f"Universe version={version} symbols={len(df)}")
+
+    return Output(
+        df,
+        metadata={
+            "version": version,
+            "num_records": len(df),
+            "vn30": int(df["is_vn30"].sum()),
+            "vn100": int(df["is_vn100"].sum()),
+            "hnx30": int(df["is_hnx30"].sum()),
+            "by_floor": MetadataValue.json(
+                df["trading_floor"].value_counts().to_dict()
+            ),
+        },
+    )
@@ -1,13 +1,19 @@
 from datetime import datetime, timedelta, timezone
 import pandas as pd
 from dagster import asset, Output, AssetIn
-from etl_pipeline.ops.api.company_info import get_company_information, get_stock_list
+from etl_pipeline.ops.api.company_info import get_company_information
 from etl_pipeline.ops.normalize.company_info import normalize_info
 
 def gold_company_info(info_type: str):
     @asset(
         name = f"gold_{info_type}",
-        ins = {"info": AssetIn(["silver", "company_info", f"silver_{info_type}"])},
+        ins = {
+            "info": AssetIn(
+                ["silver", "company_info", f"silver_{info_type}"],
+                # copy server-side; nếu không được thì nhận pyarrow Table
+                metadata={"pass_through": True, "dataframe_type": "pyarrow"},
+            )
+        },
         io_manager_key="minio_io_manager",
         key_prefix=["gold", "company_info"],
         compute_kind="python",
@@ -18,7 +24,7 @@ def gold_company_info(info_type: str):
             info,
             metadata={
                 "info_type": info_type,
-                "num_records": len(info),
+                "num_records": info.num_rows,
             },
         )
     return _asset
@@ -44,6 +50,11 @@ def warehouse_company_info(info_type: str):
             metadata={
                 "table": f"warehouse.warehouse_{info_type}",
                 "rows_loaded": len(df),
+                # bảng snapshot: key = hash dòng, xoá dòng không còn trong gold
+                "hash_diff": True,
+                "delete_missing": True,
+                # date_fetched đổi mỗi lần crawl → không tính vào hash
+                "hash_exclude": ["date_fetched"],
             },
         )
 
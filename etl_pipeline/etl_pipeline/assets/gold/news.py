@@ -3,8 +3,6 @@ from dagster import asset, AssetIn, Nothing, DailyPartitionsDefinition, Output,
 from datetime import timezone, timedelta
 from datetime import date, datetime
 import re
-import json
-import numpy as np
 
 daily = DailyPartitionsDefinition(
     start_date="2025-12-01",
@@ -16,18 +14,20 @@ daily = DailyPartitionsDefinition(
     partitions_def=daily,
     io_manager_key="minio_io_manager",
     ins={
-        "news": AssetIn(["silver", "silver_news"]),
+        "news": AssetIn(
+            ["silver", "silver_news"],
+            # copy server-side; nếu không được thì nhận pyarrow Table
+            metadata={"pass_through": True, "dataframe_type": "pyarrow"},
+        ),
     },
     group_name="gold",
     key_prefix=["gold"],
 )
-def gold_news(
-    news: pd.DataFrame,
-) -> Output[pd.DataFrame]:
+def gold_news(news):
     
     return Output(
         news,
-        metadata={"num_records": len(news)},
+        metadata={"num_records": news.num_rows},
     )
 
 
@@ -45,12 +45,7 @@ def gold_news(
 )
 def warehouse_news (gold_news: pd.DataFrame,
 ) -> Output[pd.DataFrame]:
-    gold_news["tags"] = gold_news["tags"].apply(
-        lambda x: json.dumps(x.tolist(), ensure_ascii=False)
-        if isinstance(x, np.ndarray)
-        else x
-    )
-
+    # tags (list) → JSONB do psql_io_manager ép kiểu theo warehouse_schema
     return Output(
         gold_news,
         metadata={
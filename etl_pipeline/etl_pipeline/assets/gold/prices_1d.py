@@ -18,6 +18,7 @@ def load_nearest_partition(
     asset_key,
     target_date: str,
     max_lookback: int = 10,
+    columns: list[str] | None = None,
 ):
     """
     Try to load partition at target_date.
@@ -28,7 +29,7 @@ def load_nearest_partition(
     for i in range(max_lookback + 1):
         date_str = (dt - pd.Timedelta(days=i)).strftime("%Y-%m-%d")
         try:
-            return io.load_partition(asset_key, date_str), date_str
+            return io.load_partition(asset_key, date_str, columns=columns), date_str
         except FileNotFoundError:
             continue
 
@@ -56,7 +57,12 @@ OFFSETS = {
     ins={
         "prices": AssetIn(["silver", "silver_prices_1d"]),
         "ticker_metric": AssetIn(["gold", "gold_ticker_metric"]),
-        "overview": AssetIn(["silver", "company_info", "silver_overview"]),
+        "overview": AssetIn(
+            ["silver", "company_info", "silver_overview"],
+            metadata={
+                "columns": ["ticker", "trading_floor", "cap_group", "issue_share"],
+            },
+        ),
     },
     group_name="gold",
     key_prefix=["gold"],
@@ -241,6 +247,7 @@ def gold_prices_1d(
             asset_key=asset_key,
             target_date=target_date,
             max_lookback=10,
+            columns=["ticker", "close"],
         )
 
         used_partitions[col] = used_date
@@ -294,6 +301,6 @@ def warehouse_prices_1d (gold_prices_1d: pd.DataFrame,
         metadata={
             "table": "warehouse.warehouse_prices_1d",
             "rows_loaded": len(gold_prices_1d),
-            "unique_key": ["ticker", "date"]
+            "unique_key": ["ticker", "date"],
         },
     )
\ No newline at end of file
@@ -7,18 +7,20 @@ import re
 @asset(
     io_manager_key="minio_io_manager",
     ins={
-        "reports": AssetIn(["silver", "silver_reports"]),
+        "reports": AssetIn(
+            ["silver", "silver_reports"],
+            # copy server-side; nếu không được thì nhận pyarrow Table
+            metadata={"pass_through": True, "dataframe_type": "pyarrow"},
+        ),
     },
     group_name="gold",
     key_prefix=["gold"],
 )
-def gold_reports(
-    reports: pd.DataFrame,
-) -> Output[pd.DataFrame]:
+def gold_reports(reports):
     
     return Output(
         reports,
-        metadata={"num_records": len(reports)},
+        metadata={"num_records": reports.num_rows},
     )
 
 @asset(
@@ -41,5 +43,7 @@ def warehouse_reports (gold_reports: pd.DataFrame,
             "table": "warehouse.warehouse_reports",
             "rows_loaded": len(gold_reports),
             "unique_key": ["ticker", "year", "quarter", "criteria"],
+            # chỉ gửi các dòng mới / thay đổi so với warehouse
+            "hash_diff": True,
         },
     )
\ No newline at end of file
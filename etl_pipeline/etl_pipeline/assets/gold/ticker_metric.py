@@ -41,22 +41,24 @@ def calc_trailing(s: pd.Series, period: int = 4) -> pd.Series:
     expanding_mean = s.expanding(1).mean() * period
     return rolling_sum.fillna(expanding_mean)
 
+# các chỉ tiêu BCTC mà gold_ticker_metric thực sự dùng
+# (cũng được đẩy xuống Parquet reader qua AssetIn metadata)
+WIDE_CRITERIA = [
+    "profit",
+    "equity",
+    "total_assets",
+    "revenue",
+    "interest_income",
+    "interest_expenses",
+    "deposit_at_SBV",
+    "deposit_at_FI",
+    "investment_securities",
+    "customer_loan",
+]
+
 def build_wide_financials(reports: pd.DataFrame) -> pd.DataFrame:
     df = reports[
-        reports["criteria"].isin(
-            [
-                "profit",
-                "equity",
-                "total_assets",
-                "revenue",
-                "interest_income",
-                "interest_expenses",
-                "deposit_at_SBV",
-                "deposit_at_FI",
-                "investment_securities",
-                "customer_loan",
-            ]
-        )
+        reports["criteria"].isin(WIDE_CRITERIA)
     ].copy()
 
     wide = (
@@ -124,9 +126,25 @@ def calc_bvps(
 @asset(
     io_manager_key="minio_io_manager",
     ins={
-        "overview": AssetIn(["silver", "company_info", "silver_overview"]),
-        "reports": AssetIn(["silver", "silver_reports"]),
-        "events": AssetIn(["silver", "company_info", "silver_events"]),
+        "overview": AssetIn(
+            ["silver", "company_info", "silver_overview"],
+            metadata={
+                "columns": ["ticker", "industry", "issue_share", "date_fetched"],
+            },
+        ),
+        "reports": AssetIn(
+            ["silver", "silver_reports"],
+            metadata={
+                "columns": ["ticker", "year", "quarter", "criteria", "value"],
+                "filters": [("criteria", "in", WIDE_CRITERIA)],
+            },
+        ),
+        "events": AssetIn(
+            ["silver", "company_info", "silver_events"],
+            metadata={
+                "columns": ["ticker", "event_title", "event_type", "issue_date"],
+            },
+        ),
     },
     group_name="gold",
     key_prefix=["gold"],
@@ -418,5 +436,7 @@ def warehouse_ticker_metric (gold_ticker_metric: pd.DataFrame,
             "table": "warehosue.warehouse_ticker_metric",
             "rows_loaded": len(gold_ticker_metric),
             "unique_key": ["ticker", "year", "quarter"],
+            # chỉ gửi các dòng mới / thay đổi so với warehouse
+            "hash_diff": True,
         },
     )
\ No newline at end of file
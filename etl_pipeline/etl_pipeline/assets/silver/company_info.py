@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta, timezone
 import pandas as pd
 from dagster import asset, Output, AssetIn
-from etl_pipeline.ops.api.company_info import get_company_information, get_stock_list
+from etl_pipeline.ops.api.company_info import get_company_information
 from etl_pipeline.ops.normalize.company_info import normalize_info
 
 def silver_company_info(info_type: str):
@@ -0,0 +1,22 @@
+import pandas as pd
+from dagster import asset, AssetIn, Output
+from etl_pipeline.assets.bronze.prices_5m import daily_5m
+
+@asset(
+    partitions_def=daily_5m,
+    io_manager_key="minio_io_manager",
+    ins={
+        "prices": AssetIn(["bronze", "prices", "bronze_prices_5m"]),
+    },
+    group_name="silver",
+    key_prefix=["silver"],
+)
+def silver_prices_5m(context, prices) -> Output[pd.DataFrame]:
+    prices["time"] = pd.to_datetime(prices["time"])
+    prices["date"] = prices["time"].dt.date
+    prices = prices[['ticker', 'date', 'time', 'high', 'low', 'open', 'close', 'volume']]
+    prices = prices.sort_values(["ticker", "time"]).reset_index(drop=True)
+    return Output(
+        prices,
+        metadata={"num_records": len(prices)},
+    )
@@ -16,6 +16,8 @@ from datetime import date
     },
     group_name="silver",
     key_prefix=["silver"],
+    # gold đọc theo criteria → sort theo criteria để row group prune được
+    metadata={"sort_by": ["criteria", "ticker"]},
 )
 def silver_reports(context, bs, is_, cf) -> Output[pd.DataFrame]:
     bs_bank, bs_non_bank = normalize_reports(bs, 'bs')
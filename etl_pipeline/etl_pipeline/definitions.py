@@ -11,9 +11,12 @@ from etl_pipeline.assets.bronze.vietstock import bronze_vietstock_news
 from etl_pipeline.assets.bronze.reports import bronze_reports
 from etl_pipeline.assets.bronze.company_info import bronze_company_info
 from etl_pipeline.assets.bronze.prices import bronze_prices_1d
+from etl_pipeline.assets.bronze.prices_5m import bronze_prices_5m
+from etl_pipeline.assets.bronze.universe import bronze_universe
 from etl_pipeline.assets.silver.news import silver_news
 from etl_pipeline.assets.silver.reports import silver_reports
 from etl_pipeline.assets.silver.prices_1d import silver_prices_1d
+from etl_pipeline.assets.silver.prices_5m import silver_prices_5m
 from etl_pipeline.assets.silver.company_info import silver_company_info
 from etl_pipeline.assets.gold.ticker_metric import gold_ticker_metric, warehouse_ticker_metric
 from etl_pipeline.assets.gold.prices_1d import gold_prices_1d, warehouse_prices_1d
@@ -22,6 +25,23 @@ from etl_pipeline.assets.gold.news import gold_news, warehouse_news
 # from etl_pipeline.assets.gold.vietstock import gold_vietstock_tickers, gold_vietstock_news
 from etl_pipeline.assets.gold.reports import gold_reports, warehouse_reports
 
+# Jobs
+from etl_pipeline.jobs.maintenance import (
+    rebuild_partition_manifests_job,
+    compact_price_partitions_job,
+    compact_price_partitions_schedule,
+)
+from etl_pipeline.jobs.universe import (
+    refresh_universe_job,
+    refresh_universe_schedule,
+)
+from etl_pipeline.jobs.intraday import (
+    intraday_prices_job,
+    close_prices_5m_job,
+    intraday_prices_schedule,
+    close_prices_5m_schedule,
+)
+
 from dagster import Definitions, load_assets_from_modules
 
 bronze_income_statement = bronze_reports("is")
@@ -75,7 +95,10 @@ defs = Definitions(
         silver_reports,
         silver_news,
         silver_prices_1d,
+        silver_prices_5m,
         bronze_prices_1d,
+        bronze_prices_5m,
+        bronze_universe,
         bronze_income_statement,
         bronze_balance_sheet,
         bronze_cash_flow,
@@ -87,6 +110,19 @@ defs = Definitions(
         bronze_company_events,
         bronze_company_officers,
     ],
+    jobs=[
+        rebuild_partition_manifests_job,
+        compact_price_partitions_job,
+        refresh_universe_job,
+        intraday_prices_job,
+        close_prices_5m_job,
+    ],
+    schedules=[
+        compact_price_partitions_schedule,
+        refresh_universe_schedule,
+        intraday_prices_schedule,
+        close_prices_5m_schedule,
+    ],
     resources = {
         "minio_io_manager": MinIOIOManager(MINIO_CONFIG),
         "psql_io_manager": PostgreSQLIOManager(PSQL_CONFIG)
@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+
+from dagster import AssetSelection, RunRequest, define_asset_job, schedule
+
+VN_TZ = timezone(timedelta(hours=7))
+
+intraday_prices_job = define_asset_job(
+    "intraday_prices_job",
+    selection=AssetSelection.keys(["bronze", "prices", "bronze_prices_5m"]),
+)
+
+close_prices_5m_job = define_asset_job(
+    "close_prices_5m_job",
+    selection=AssetSelection.keys(
+        ["bronze", "prices", "bronze_prices_5m"],
+        ["silver", "silver_prices_5m"],
+    ),
+)
+
+
+def _today() -> str:
+    return datetime.now(VN_TZ).strftime("%Y-%m-%d")
+
+
+# poll 5 phút/lần trong giờ giao dịch (9:00–11:30, 13:00–14:45)
+@schedule(
+    job=intraday_prices_job,
+    cron_schedule=[
+        "*/5 9-10 * * 1-5",
+        "0-30/5 11 * * 1-5",
+        "*/5 13 * * 1-5",
+        "0-45/5 14 * * 1-5",
+    ],
+    execution_timezone="Asia/Ho_Chi_Minh",
+)
+def intraday_prices_schedule(context):
+    return RunRequest(partition_key=_today())
+
+
+# sau giờ đóng cửa: lần poll cuối + compact log trong ngày → silver
+@schedule(
+    job=close_prices_5m_job,
+    cron_schedule="5 15 * * 1-5",
+    execution_timezone="Asia/Ho_Chi_Minh",
+)
+def close_prices_5m_schedule(context):
+    return RunRequest(partition_key=_today(), run_key=f"close_{_today()}")
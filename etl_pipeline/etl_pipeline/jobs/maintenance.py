@@ -0,0 +1,86 @@
+from dagster import AssetKey, Config, ScheduleDefinition, job, op
+
+# các asset partitioned lưu trên MinIO (asset_key viết dạng "a/b/c")
+PARTITIONED_ASSETS = [
+    "bronze/prices/bronze_prices_1d",
+    "bronze/prices/bronze_prices_5m",
+    "bronze/reports/bronze_income_statement",
+    "bronze/reports/bronze_balance_sheet",
+    "bronze/reports/bronze_cash_flow",
+    "bronze/bronze_vietcap_news",
+    "bronze/bronze_vietstock_news",
+    "silver/silver_news",
+    "silver/silver_prices_1d",
+    "silver/silver_prices_5m",
+    "gold/gold_news",
+    "gold/gold_prices_1d",
+]
+
+# asset giá theo ngày → gộp tháng/năm đã đóng
+PRICE_ASSETS = [
+    "bronze/prices/bronze_prices_1d",
+    "silver/silver_prices_1d",
+    "gold/gold_prices_1d",
+]
+
+
+class RebuildManifestConfig(Config):
+    asset_keys: list[str] = PARTITIONED_ASSETS
+    row_counts: bool = True
+
+
+@op(required_resource_keys={"minio_io_manager"})
+def rebuild_partition_manifests(context, config: RebuildManifestConfig):
+    """
+    Dựng lại _manifest.json của từng asset từ list_objects
+    (recovery khi manifest bị mất hoặc lệch với dữ liệu thật).
+    """
+    io = context.resources.minio_io_manager
+
+    for key in config.asset_keys:
+        manifest = io.rebuild_manifest(
+            AssetKey(key.split("/")),
+            row_counts=config.row_counts,
+        )
+        context.log.info(
+            f"Rebuilt manifest {key} | "
+            f"partitions={len(manifest['partitions'])}"
+        )
+
+
+@job
+def rebuild_partition_manifests_job():
+    rebuild_partition_manifests()
+
+
+class CompactPartitionsConfig(Config):
+    asset_keys: list[str] = PRICE_ASSETS
+
+
+@op(required_resource_keys={"minio_io_manager"})
+def compact_price_partitions(context, config: CompactPartitionsConfig):
+    """
+    Gộp partition ngày của tháng đã đóng → 1 file/tháng,
+    năm đã đóng → 1 file/năm (sort theo ticker).
+    """
+    io = context.resources.minio_io_manager
+
+    for key in config.asset_keys:
+        written = io.compact_partitions(
+            AssetKey(key.split("/")),
+            log=context.log,
+        )
+        context.log.info(f"Compaction {key} | files_written={len(written)}")
+
+
+@job
+def compact_price_partitions_job():
+    compact_price_partitions()
+
+
+# chạy đầu mỗi tháng, sau khi tháng trước đã đóng
+compact_price_partitions_schedule = ScheduleDefinition(
+    job=compact_price_partitions_job,
+    cron_schedule="0 2 1 * *",
+    execution_timezone="Asia/Ho_Chi_Minh",
+)
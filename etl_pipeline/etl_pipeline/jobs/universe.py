@@ -0,0 +1,13 @@
+from dagster import AssetSelection, ScheduleDefinition, define_asset_job
+
+refresh_universe_job = define_asset_job(
+    "refresh_universe_job",
+    selection=AssetSelection.keys(["bronze", "bronze_universe"]),
+)
+
+# chạy trước phiên sáng, trước các asset crawl trong ngày
+refresh_universe_schedule = ScheduleDefinition(
+    job=refresh_universe_job,
+    cron_schedule="0 7 * * *",
+    execution_timezone="Asia/Ho_Chi_Minh",
+)
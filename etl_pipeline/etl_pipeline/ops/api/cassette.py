@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.exceptions import RequestException
+from requests.structures import CaseInsensitiveDict
+
+from config.config import HTTP_CASSETTE_CONFIG
+
+logger = logging.getLogger("http_cassette")
+
+# =====================================================
+# 🔹 HTTP CASSETTE (record / replay)
+# =====================================================
+# Patch requests.Session.send → mọi request của vnstock và các lần
+# requests.get trong crawler đi qua đây.
+#
+# HTTP_CASSETTE_MODE:
+#   off     → không làm gì (mặc định)
+#   record  → gọi thật, lưu response vào cassette
+#   replay  → chỉ đọc cassette, không có thì lỗi CassetteMiss (không ra mạng)
+#   auto    → có trong cassette thì replay, không thì gọi thật và record
+# HTTP_CASSETTE_LATENCY_MS: độ trễ khi replay (số ms, hoặc "recorded" =
+# dùng đúng thời gian đã đo lúc record) để benchmark throughput offline.
+#
+# File: {dir}/{host}/{key[:2]}/{key}.json, key = sha256(method, url đã
+# sort query, body).
+MODES = ("off", "record", "replay", "auto")
+
+_INSTALLED = False
+_INSTALL_LOCK = threading.Lock()
+_ORIGINAL_SEND = requests.Session.send
+
+
+class CassetteMiss(RequestException):
+    """Replay mode nhưng request chưa có trong cassette."""
+
+
+def _mode() -> str:
+    mode = HTTP_CASSETTE_CONFIG["mode"]
+    if mode not in MODES:
+        raise ValueError(f"HTTP_CASSETTE_MODE must be one of {MODES}")
+    return mode
+
+
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+
+def request_key(request) -> str:
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode()
+
+    h = hashlib.sha256()
+    h.update(request.method.upper().encode())
+    h.update(b"\0")
+    h.update(_normalize_url(request.url).encode())
+    h.update(b"\0")
+    h.update(body)
+    return h.hexdigest()
+
+
+def _cassette_path(request, key: str) -> str:
+    host = urlsplit(request.url).netloc or "_"
+    return os.path.join(HTTP_CASSETTE_CONFIG["dir"], host, key[:2], f"{key}.json")
+
+
+def _save(path: str, request, response, elapsed: float):
+    payload = {
+        "request": {
+            "method": request.method,
+            "url": request.url,
+        },
+        "status_code": response.status_code,
+        "reason": response.reason,
+        "headers": dict(response.headers),
+        "encoding": response.encoding,
+        "body": base64.b64encode(response.content).decode(),
+        "elapsed": elapsed,
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _load(path: str, request) -> tuple[requests.Response, float]:
+    with open(path) as f:
+        payload = json.load(f)
+
+    response = requests.Response()
+    response.status_code = payload["status_code"]
+    response.reason = payload["reason"]
+    response.headers = CaseInsensitiveDict(payload["headers"])
+    response.encoding = payload["encoding"]
+    body = base64.b64decode(payload["body"])
+    # giống response thật đã đọc xong: iter_content / raw.read dùng được
+    response._content = body
+    response._content_consumed = True
+    response.raw = io.BytesIO(body)
+    response.url = request.url
+    response.request = request
+    return response, payload.get("elapsed", 0.0)
+
+
+def _replay_delay(recorded: float) -> float:
+    latency = str(HTTP_CASSETTE_CONFIG["latency_ms"]).strip()
+    if latency == "recorded":
+        return recorded
+    return float(latency or 0) / 1000
+
+
+def _send(session, request, **kwargs):
+    mode = _mode()
+    if mode == "off":
+        return _ORIGINAL_SEND(session, request, **kwargs)
+
+    key = request_key(request)
+    path = _cassette_path(request, key)
+
+    if mode in ("replay", "auto") and os.path.exists(path):
+        response, recorded = _load(path, request)
+        delay = _replay_delay(recorded)
+        if delay > 0:
+            time.sleep(delay)
+        return response
+
+    if mode == "replay":
+        raise CassetteMiss(f"Cassette miss: {request.method} {request.url}")
+
+    started = time.perf_counter()
+    response = _ORIGINAL_SEND(session, request, **kwargs)
+    elapsed = time.perf_counter() - started
+
+    # chỉ lưu response thành công, lỗi tạm thời (429/5xx) không nên replay lại
+    if response.status_code < 400:
+        _save(path, request, response, elapsed)
+    return response
+
+
+def install_cassette():
+    """
+    Patch requests.Session.send (1 lần / process). Gọi lúc import ở
+    client layer và crawler; mode "off" thì không patch.
+    """
+    global _INSTALLED
+
+    with _INSTALL_LOCK:
+        if _INSTALLED or _mode() == "off":
+            return
+        requests.Session.send = _send
+        _INSTALLED = True
+
+    logger.info(
+        f"HTTP cassette installed | mode={_mode()} dir={HTTP_CASSETTE_CONFIG['dir']}"
+    )
@@ -0,0 +1,54 @@
+import pandas as pd
+
+from config.config import VNSTOCK_CONFIG
+
+
+def fetch_with_checkpoint(
+    *,
+    context,
+    io,
+    asset_key,
+    tickers: list[str],
+    fetch,
+    batch_size: int | None = None,
+) -> pd.DataFrame:
+    """
+    Full load có checkpoint: fetch theo lô `batch_size` ticker, mỗi lô
+    ghi ngay vào staging trên MinIO + _checkpoint.json. Chạy lại sau
+    crash thì bỏ qua ticker đã xong (ticker không có dữ liệu được thử lại).
+
+    fetch(batch) → DataFrame có cột "ticker" (get_prices / get_report).
+    Trả về toàn bộ dữ liệu staging; asset tự chia partition rồi gọi
+    io.clear_staging() khi đã ghi xong. Gọi trong io.full_load_lock(asset_key)
+    (staging dùng chung theo asset).
+    """
+    batch_size = batch_size or VNSTOCK_CONFIG["checkpoint_batch"]
+
+    checkpoint = io.read_checkpoint(asset_key)
+    done = set(checkpoint["done"]) if checkpoint else set()
+    pending = [t for t in tickers if t not in done]
+
+    if checkpoint:
+        context.log.info(
+            f"Resume from checkpoint | done={len(done)} "
+            f"batches={len(checkpoint['batches'])} pending={len(pending)}"
+        )
+
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i:i + batch_size]
+        df = fetch(batch)
+
+        fetched = set(df["ticker"].unique()) if not df.empty else set()
+        checkpoint = io.write_staging_batch(
+            asset_key,
+            df,
+            done=fetched,
+            skipped=set(batch) - fetched,
+        )
+
+        context.log.info(
+            f"Checkpoint {len(checkpoint['done'])}/{len(tickers)} tickers | "
+            f"batches={len(checkpoint['batches'])}"
+        )
+
+    return io.load_staging(asset_key, log=context.log)
@@ -0,0 +1,240 @@
+import bisect
+import random
+import re
+import threading
+import time
+
+from requests.exceptions import ConnectionError, HTTPError, Timeout
+
+from config.config import VNSTOCK_CONFIG
+from .cassette import install_cassette
+from .rate_limit import get_bucket
+
+# HTTP_CASSETTE_MODE != off → mọi request vnstock đi qua cassette
+install_cassette()
+
+
+# =====================================================
+# 🔹 THỐNG KÊ GỌI API
+# =====================================================
+# cận trên (giây) của các bucket latency
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+
+class CallStats:
+    """
+    Histogram latency (mỗi lần gọi) và số lần retry (mỗi ticker).
+    Thread-safe, dùng chung được giữa các worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.retries = {}
+        self.outcomes = {"ok": 0, "throttled": 0, "transient": 0, "failed": 0}
+
+    def record_attempt(self, seconds: float, outcome: str):
+        idx = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            self.latency[idx] += 1
+            self.outcomes[outcome] += 1
+
+    def record_call(self, retries: int):
+        with self._lock:
+            self.retries[retries] = self.retries.get(retries, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            labels = [f"<={b}s" for b in LATENCY_BUCKETS] + [f">{LATENCY_BUCKETS[-1]}s"]
+            return {
+                "latency": dict(zip(labels, self.latency)),
+                "retries": {str(k): v for k, v in sorted(self.retries.items())},
+                "outcomes": dict(self.outcomes),
+            }
+
+
+# =====================================================
+# 🔹 CIRCUIT BREAKER
+# =====================================================
+class CircuitBreaker:
+    """
+    Khi provider báo throttle, mở mạch trong `seconds` giây: mọi worker
+    (kể cả đang chuẩn bị gọi ticker khác) đứng chờ cho tới khi mạch đóng,
+    thay vì mỗi thread tự bắn request rồi cùng bị chặn.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open_until = 0.0
+
+    def trip(self, seconds: float) -> bool:
+        """Mở mạch; trả về True nếu lần gọi này kéo dài thời gian mở."""
+        with self._lock:
+            until = time.monotonic() + seconds
+            if until <= self._open_until:
+                return False
+            self._open_until = until
+            return True
+
+    def wait(self) -> float:
+        waited = 0.0
+        while True:
+            with self._lock:
+                remaining = self._open_until - time.monotonic()
+            if remaining <= 0:
+                return waited
+            time.sleep(remaining)
+            waited += remaining
+
+
+# dùng chung cho mọi fetcher trong process
+BREAKER = CircuitBreaker()
+STATS = CallStats()
+
+
+# =====================================================
+# 🔹 PHÂN LOẠI LỖI
+# =====================================================
+_RETRY_AFTER_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(?:giây|seconds?|secs?|s)\b", re.IGNORECASE)
+
+
+def _status_code(exc) -> int | None:
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def retry_after(exc) -> float | None:
+    """
+    Thời gian chờ provider yêu cầu: header Retry-After nếu là HTTPError,
+    hoặc số giây trong thông báo (vnstock in ra rồi gọi sys.exit).
+    """
+    response = getattr(exc, "response", None)
+    header = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+
+    m = _RETRY_AFTER_RE.search(str(exc.code if isinstance(exc, SystemExit) else exc))
+    if m:
+        return float(m.group(1))
+    return None
+
+
+def classify(exc) -> str:
+    """
+    - throttled: vnstock SystemExit / HTTP 429 → mở circuit breaker
+    - transient: lỗi mạng, timeout, HTTP 5xx → backoff rồi thử lại
+    - failed: còn lại → bỏ qua ticker
+    """
+    if isinstance(exc, SystemExit):
+        return "throttled"
+
+    status = _status_code(exc)
+    if status == 429:
+        return "throttled"
+    if isinstance(exc, (ConnectionError, Timeout)):
+        return "transient"
+    if isinstance(exc, HTTPError) and status is not None and status >= 500:
+        return "transient"
+    return "failed"
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff + jitter (nửa cố định, nửa ngẫu nhiên)."""
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# =====================================================
+# 🔹 RATE LIMIT
+# =====================================================
+def provider_bucket(source: str = "VCI"):
+    """
+    Token bucket dùng chung toàn host cho 1 provider: mọi fetcher ở
+    ops/api (prices, reports, company_info) lấy token từ đây trước khi gọi.
+    """
+    return get_bucket(
+        source,
+        rate=VNSTOCK_CONFIG["rate_per_sec"],
+        capacity=VNSTOCK_CONFIG["burst"],
+        path=VNSTOCK_CONFIG["rate_limit_db"],
+    )
+
+
+# =====================================================
+# 🔹 RETRY
+# =====================================================
+def retry_call(
+    fn,
+    logger,
+    max_retries: int | None = None,
+    base_delay: float | None = None,
+    max_delay: float | None = None,
+    stats: CallStats | None = None,
+    source: str = "VCI",
+):
+    """
+    Gọi `fn` với retry dùng chung cho mọi fetcher vnstock.
+    Mỗi lần gọi (kể cả retry) lấy 1 token từ bucket của `source`.
+    Trả về kết quả của fn, hoặc None nếu hết lượt / lỗi không retry được.
+    """
+    bucket = provider_bucket(source)
+    max_retries = max_retries or VNSTOCK_CONFIG["max_retries"]
+    base_delay = base_delay or VNSTOCK_CONFIG["backoff_base"]
+    max_delay = max_delay or VNSTOCK_CONFIG["backoff_max"]
+
+    for attempt in range(1, max_retries + 1):
+        BREAKER.wait()
+        bucket.acquire()
+
+        started = time.perf_counter()
+        try:
+            result = fn()
+            outcome = "ok"
+        except (Exception, SystemExit) as e:
+            exc = e
+            outcome = classify(e)
+
+        for s in (STATS, stats):
+            if s is not None:
+                s.record_attempt(time.perf_counter() - started, outcome)
+
+        if outcome == "ok":
+            for s in (STATS, stats):
+                if s is not None:
+                    s.record_call(attempt - 1)
+            return result
+
+        if outcome == "failed":
+            logger.error(f"Unexpected error. Skip symbol: {exc}")
+            break
+
+        if attempt == max_retries:
+            logger.error(f"{outcome.capitalize()} error. Max retries reached. Skip symbol")
+            break
+
+        delay = backoff_delay(attempt, base_delay, max_delay)
+
+        if outcome == "throttled":
+            delay = max(delay, retry_after(exc) or 0)
+            # giãn cả các run khác trên host, không chỉ process này
+            bucket.drain(delay)
+            if BREAKER.trip(delay):
+                logger.warning(
+                    f"Rate limit hit. Pause all workers {delay:.1f}s "
+                    f"(retry {attempt}/{max_retries})"
+                )
+            # BREAKER.wait() ở vòng sau lo phần chờ
+            continue
+
+        logger.warning(
+            f"Transient error ({exc}). Retry {attempt}/{max_retries} after {delay:.1f}s"
+        )
+        time.sleep(delay)
+
+    for s in (STATS, stats):
+        if s is not None:
+            s.record_call(attempt - 1)
+    return None
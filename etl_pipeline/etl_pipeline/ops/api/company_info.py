@@ -1,53 +1,8 @@
 import pandas as pd
-import time
-from requests.exceptions import ConnectionError
 from datetime import datetime
-from vnstock import Listing, Company
-
-def retry_call(
-    fn,
-    logger,
-    max_retries=3,
-    retry_sleep=5,
-    rate_limit_sleep=20,
-):
-    for attempt in range(1, max_retries + 1):
-        try:
-            return fn()
-
-        except SystemExit:
-            if attempt < max_retries:
-                logger.warning(
-                    f"Rate limit hit. Retry {attempt}/{max_retries} "
-                    f"after {rate_limit_sleep}s"
-                )
-                time.sleep(rate_limit_sleep)
-            else:
-                logger.error("Rate limit hit. Max retries reached.")
-                return None
-
-        except ConnectionError as e:
-            if attempt < max_retries:
-                logger.warning(
-                    f"Connection error. Retry {attempt}/{max_retries} "
-                    f"after {retry_sleep}s"
-                )
-                time.sleep(retry_sleep)
-            else:
-                logger.error(
-                    "Connection error. Max retries reached. Skip symbol"
-                )
-                return None
-
-        except Exception as e:
-            logger.error(f"Unexpected error. Skip symbol: {e}")
-            return None
-
-def get_stock_list():
-    listing = Listing(source="VCI")
-    df = pd.DataFrame(listing.symbols_by_exchange())
-    df = df[df["type"] == "STOCK"]
-    return df["symbol"].tolist()
+from vnstock import Company
+
+from .client import CallStats, retry_call
 
 def get_company_information(
     context,
@@ -58,6 +13,7 @@ def get_company_information(
     bronze_frames = []
     fetched_symbols = []
     skipped_symbols = []
+    call_stats = CallStats()
     total = len(tickers)
 
     TYPE_KWARGS = {
@@ -82,7 +38,7 @@ def get_company_information(
             kwargs = TYPE_KWARGS.get(type, {})
             return method(**kwargs)
 
-        df = retry_call(fn, logger=context.log)
+        df = retry_call(fn, logger=context.log, stats=call_stats)
 
         if df is None or df.empty:
             context.log.warning(f"Skip {ticker}")
@@ -105,6 +61,7 @@ def get_company_information(
     context.log.info("INGEST SUMMARY")
     context.log.info(f"Success ({len(fetched_symbols)}): {fetched_symbols}")
     context.log.info(f"Skipped ({len(skipped_symbols)}): {skipped_symbols}")
+    context.log.info(f"Calls: {call_stats.snapshot()}")
 
     if not bronze_frames:
         context.log.warning("No data fetched")
@@ -1,39 +1,12 @@
 import pandas as pd
 import time
-from requests.exceptions import ConnectionError
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from vnstock import Finance, Listing, Quote
-
-def get_stock_list():
-    listing = Listing(source="VCI")
-    df = pd.DataFrame(listing.symbols_by_exchange())
-    df = df[df["type"] == "STOCK"]
-    return df["symbol"].tolist()
-
-def retry_call(fn, logger, max_retries=10, rate_limit_sleep=20):
-    for attempt in range(1, max_retries + 1):
-        try:
-            return fn()
-
-        except SystemExit:
-            if attempt < max_retries:
-                logger.warning(
-                    f"Rate limit hit. Retry {attempt}/{max_retries} "
-                    f"after {rate_limit_sleep}s"
-                )
-                time.sleep(rate_limit_sleep)
-            else:
-                logger.error("Rate limit hit. Max retries reached.")
-                return None
-
-        except ConnectionError:
-            logger.warning("Connection error (502/504). Skip symbol")
-            return None
-
-        except Exception as e:
-            logger.error(f"Unexpected error. Skip symbol: {e}")
-            return None
-        
+from vnstock import Quote
+
+from config.config import VNSTOCK_CONFIG
+from .client import CallStats, provider_bucket, retry_call
+
 def get_prices(
     *,
     context,
@@ -41,76 +14,118 @@ def get_prices(
     limit: int | None = None,
     interval: str = '1d',
     start_date: str,
-    end_date:  str
+    end_date:  str,
+    max_workers: int | None = None,
 ) -> pd.DataFrame:
     """
-    Bronze layer financial reports
+    Bronze layer prices
+
+    Gọi song song `max_workers` ticker, mọi request đi qua token bucket
+    VCI dùng chung toàn host (xem client.provider_bucket) để không vượt
+    giới hạn của provider. Ticker lỗi được gọi lại 1 lượt sau cùng.
+    Thống kê (số mã, thời gian, tickers/s) nằm ở df.attrs["fetch_stats"].
     """
-    bronze_frames = []
-    fetched_symbols = []
-    skipped_symbols = []
+    if interval not in ("1d", "5m"):
+        raise ValueError(
+            "interval must be one of: '1d' or '5m'"
+        )
+
+    max_workers = max_workers or VNSTOCK_CONFIG["max_workers"]
+    bucket = provider_bucket("VCI")
 
+    if limit:
+        tickers = tickers[:limit]
     total = len(tickers)
 
     context.log.info(
-        f"Start fetching {interval} prices for symbols={total}"
+        f"Start fetching {interval} prices for symbols={total} "
+        f"(workers={max_workers}, rate={bucket.rate}/s)"
     )
 
-    for idx, ticker in enumerate(tickers, start=1):
-        context.log.info(
-            f"[{idx}/{total}] Fetching {interval} prices for {ticker}"
-        )
-
-        # --- chọn đúng API call ---
-        if interval == "1d":
-            fn = lambda t=ticker: Quote(
-                symbol=t, source='VCI').history(
-                start=start_date, end=end_date, interval='1d')
-
-        elif interval == "5m":
-            fn = lambda t=ticker: Quote(
-                symbol=t, source='VCI').history(
-                start=start_date, end=end_date, interval='5m')
+    call_stats = CallStats()
 
-        else:
-            raise ValueError(
-                "interval must be one of: '1d' or '5m'"
-            )
-
-        # --- gọi API với retry ---
-        df_raw = retry_call(fn, logger=context.log)
-
-        if df_raw is None or df_raw.empty:
-            context.log.warning(f"Skip {ticker}")
-            skipped_symbols.append(ticker)
-            continue
-
-        context.log.info(
-            f"Fetched {interval}  for {ticker} "
-            f"({len(df_raw)} rows)"
+    def _fetch(ticker):
+        df_raw = retry_call(
+            lambda: Quote(symbol=ticker, source='VCI').history(
+                start=start_date, end=end_date, interval=interval),
+            logger=context.log,
+            stats=call_stats,
         )
+        return ticker, df_raw
 
-        fetched_symbols.append(ticker)
-
-        # --- Bronze metadata ---
-        df_raw = df_raw.copy()
-        df_raw["ticker"] = ticker
-        df_raw["date_fetched"] = datetime.now()
+    started = time.perf_counter()
+    results = {}
+    skipped_symbols = []
+    retried_symbols = []
+
+    pending = list(tickers)
+    for attempt in (1, 2):
+        failed = []
+        done = 0
+        log_every = max(1, len(pending) // 20)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            futures = [ex.submit(_fetch, t) for t in pending]
+            for fut in as_completed(futures):
+                ticker, df_raw = fut.result()
+                done += 1
+
+                # None = lỗi (rate limit / kết nối) → thử lại; rỗng = không có dữ liệu
+                if df_raw is None:
+                    failed.append(ticker)
+                elif df_raw.empty:
+                    skipped_symbols.append(ticker)
+                else:
+                    results[ticker] = df_raw
+
+                if done % log_every == 0 or done == len(pending):
+                    elapsed = time.perf_counter() - started
+                    context.log.info(
+                        f"[pass {attempt}] {done}/{len(pending)} done | "
+                        f"fetched={len(results)} failed={len(failed)} | "
+                        f"{len(results) / elapsed:.2f} tickers/s"
+                    )
+
+        if not failed or attempt == 2:
+            skipped_symbols += failed
+            break
 
-        bronze_frames.append(df_raw)
+        context.log.warning(f"Retry {len(failed)} failed symbols")
+        retried_symbols = pending = failed
 
-        # --- optional limit ---
-        if limit and len(fetched_symbols) >= limit:
-            context.log.warning(f"Reached limit = {limit}")
-            break
+    elapsed = time.perf_counter() - started
+    fetch_stats = {
+        "symbols": total,
+        "fetched": len(results),
+        "skipped": len(skipped_symbols),
+        "retried": len(retried_symbols),
+        "seconds": round(elapsed, 1),
+        "tickers_per_sec": round(len(results) / elapsed, 2) if elapsed else None,
+        "calls": call_stats.snapshot(),
+    }
 
     # --- summary ---
     context.log.info("INGEST SUMMARY")
-    context.log.info(f"Success ({len(fetched_symbols)}): {fetched_symbols}")
-    context.log.info(f"Skipped ({len(skipped_symbols)}): {skipped_symbols}")
+    context.log.info(f"Stats: {fetch_stats}")
+    context.log.info(f"Skipped ({len(skipped_symbols)}): {sorted(skipped_symbols)}")
 
-    if not bronze_frames:
+    if not results:
         context.log.warning("No data fetched")
-        return pd.DataFrame()
+        df = pd.DataFrame()
+        df.attrs["fetch_stats"] = fetch_stats
+        return df
+
+    # --- Bronze metadata --- (giữ thứ tự ticker đầu vào)
+    fetched_at = datetime.now()
+    bronze_frames = []
+    for ticker in tickers:
+        if ticker not in results:
+            continue
+        df_raw = results[ticker].copy()
+        df_raw["ticker"] = ticker
+        df_raw["date_fetched"] = fetched_at
+        bronze_frames.append(df_raw)
 
-    return pd.concat(bronze_frames, ignore_index=True)
\ No newline at end of file
+    df = pd.concat(bronze_frames, ignore_index=True)
+    df.attrs["fetch_stats"] = fetch_stats
+    return df
@@ -0,0 +1,162 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+
+class TokenBucket:
+    """
+    Token bucket dùng chung giữa các thread trong process.
+
+    - `rate`: số token nạp thêm mỗi giây (≈ số request / giây cho phép)
+    - `capacity`: số token tối đa tích luỹ được (burst)
+
+    Mỗi request gọi acquire() trước khi gửi; hết token thì thread
+    đứng chờ tới khi được nạp đủ, nên tổng tốc độ của mọi worker
+    không vượt `rate`.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        if rate <= 0:
+            raise ValueError("rate phải > 0")
+
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Lấy `tokens` token, chờ nếu cần. Trả về số giây đã phải chờ.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+
+            time.sleep(wait)
+            waited += wait
+
+    def drain(self, seconds: float):
+        """Provider báo throttle: không cấp token trong `seconds` giây."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class SharedTokenBucket:
+    """
+    Token bucket dùng chung cho mọi process trên cùng host (các Dagster
+    run chạy song song), trạng thái lưu trong 1 file SQLite.
+
+    Mỗi acquire() mở transaction BEGIN IMMEDIATE (SQLite tự khoá ghi
+    giữa các process), nạp token theo thời gian thực rồi trừ token hoặc
+    tính thời gian phải chờ. Thời gian chờ có thêm jitter nhỏ để các
+    process không cùng thức dậy một lúc.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: int, path: str):
+        if rate <= 0:
+            raise ValueError("rate phải > 0")
+
+        self.name = name
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self.path = path
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)",
+                (name, float(self.capacity), time.time()),
+            )
+
+    def _connect(self):
+        # autocommit để tự điều khiển BEGIN IMMEDIATE
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _take(self, tokens: float) -> float:
+        """Trừ token nếu đủ (trả 0), ngược lại trả số giây cần chờ."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)
+                ).fetchone()
+                now = time.time()
+                current, updated = row if row else (float(self.capacity), now)
+                current = min(self.capacity, current + max(0.0, now - updated) * self.rate)
+
+                if current >= tokens:
+                    current -= tokens
+                    wait = 0.0
+                else:
+                    wait = (tokens - current) / self.rate
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)",
+                    (self.name, current, now),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def acquire(self, tokens: float = 1) -> float:
+        waited = 0.0
+        while True:
+            wait = self._take(tokens)
+            if wait <= 0:
+                return waited
+            wait += random.uniform(0, 1 / self.rate)
+            time.sleep(wait)
+            waited += wait
+
+    def drain(self, seconds: float):
+        """
+        Provider báo throttle: đưa bucket về âm tương đương `seconds` giây
+        để mọi process trên host cùng giãn ra, không chỉ process bị chặn.
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE buckets SET tokens = MIN(tokens, ?), updated = ? WHERE name = ?",
+                (-seconds * self.rate, time.time(), self.name),
+            )
+
+
+_BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+def get_bucket(source: str, *, rate: float, capacity: int, path: str | None):
+    """
+    Bucket của 1 provider (vd. "VCI"), cache theo process.
+    `path` rỗng → chỉ giới hạn trong process (TokenBucket).
+    """
+    with _BUCKETS_LOCK:
+        bucket = _BUCKETS.get(source)
+        if bucket is None:
+            if path:
+                bucket = SharedTokenBucket(source, rate, capacity, path)
+            else:
+                bucket = TokenBucket(rate, capacity)
+            _BUCKETS[source] = bucket
+        return bucket
@@ -1,39 +1,9 @@
 import pandas as pd
-import time
-from requests.exceptions import ConnectionError
 from datetime import datetime
-from vnstock import Finance, Listing
-
-def get_stock_list():
-    listing = Listing(source="VCI")
-    df = pd.DataFrame(listing.symbols_by_exchange())
-    df = df[df["type"] == "STOCK"]
-    return df["symbol"].tolist()
-
-def retry_call(fn, logger, max_retries=10, rate_limit_sleep=20):
-    for attempt in range(1, max_retries + 1):
-        try:
-            return fn()
-
-        except SystemExit:
-            if attempt < max_retries:
-                logger.warning(
-                    f"Rate limit hit. Retry {attempt}/{max_retries} "
-                    f"after {rate_limit_sleep}s"
-                )
-                time.sleep(rate_limit_sleep)
-            else:
-                logger.error("Rate limit hit. Max retries reached.")
-                return None
-
-        except ConnectionError:
-            logger.warning("Connection error (502/504). Skip symbol")
-            return None
-
-        except Exception as e:
-            logger.error(f"Unexpected error. Skip symbol: {e}")
-            return None
-        
+from vnstock import Finance
+
+from .client import CallStats, retry_call
+
 def get_report(
     *,
     context,
@@ -54,6 +24,7 @@ def get_report(
     bronze_frames = []
     fetched_symbols = []
     skipped_symbols = []
+    call_stats = CallStats()
 
     total = len(tickers)
     report_name = REPORT_TYPE.get(report_type, report_type.upper())
@@ -89,7 +60,7 @@ def get_report(
             )
 
         # --- gọi API với retry ---
-        df_raw = retry_call(fn, logger=context.log)
+        df_raw = retry_call(fn, logger=context.log, stats=call_stats)
 
         if df_raw is None or df_raw.empty:
             context.log.warning(f"Skip {ticker}")
@@ -120,6 +91,7 @@ def get_report(
     context.log.info("INGEST SUMMARY")
     context.log.info(f"Success ({len(fetched_symbols)}): {fetched_symbols}")
     context.log.info(f"Skipped ({len(skipped_symbols)}): {skipped_symbols}")
+    context.log.info(f"Calls: {call_stats.snapshot()}")
 
     if not bronze_frames:
         context.log.warning("No data fetched")
@@ -0,0 +1,148 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+from vnstock import Listing
+
+from config.config import VNSTOCK_CONFIG
+from .client import retry_call
+
+logger = logging.getLogger("universe")
+
+# =====================================================
+# 🔹 TICKER UNIVERSE
+# =====================================================
+# Danh sách mã + listing metadata (sàn, VN30/VN100/HNX30, ngành ICB).
+# Gọi Listing(source="VCI") tối đa 1 lần / TTL: asset bronze_universe làm
+# mới mỗi ngày và ghi snapshot local; các bước crawl / normalize chỉ đọc
+# snapshot (không gọi mạng) khi snapshot còn hạn.
+UNIVERSE_COLUMNS = [
+    "ticker",
+    "name",
+    "trading_floor",
+    "is_vn30",
+    "is_vn100",
+    "is_hnx30",
+    "industry",
+    "subindustry",
+    "date_fetched",
+]
+
+_CACHE = {"df": None, "loaded_at": 0.0}
+_CACHE_LOCK = threading.Lock()
+
+
+def _call(fn):
+    result = retry_call(fn, logger=logger)
+    if result is None:
+        raise RuntimeError("Failed to fetch listing from VCI")
+    return result
+
+
+def fetch_universe() -> pd.DataFrame:
+    """
+    Gọi API listing (4 request) và dựng bảng universe.
+    """
+    listing = Listing(source="VCI")
+
+    df = pd.DataFrame(_call(listing.symbols_by_exchange))
+    df = df[df["type"] == "STOCK"].reset_index(drop=True)
+
+    df = df.rename(columns={
+        "symbol": "ticker",
+        "organ_short_name": "name",
+        "exchange": "trading_floor"
+    })
+
+    df = df[['ticker', 'name', 'trading_floor']]
+
+    # nhóm theo vốn hóa
+    vn30 = _call(lambda: listing.symbols_by_group('VN30'))
+    vn100 = _call(lambda: listing.symbols_by_group('VN100'))
+    hnx30 = _call(lambda: listing.symbols_by_group('HNX30'))
+    df["is_vn30"] = df["ticker"].isin(vn30)
+    df["is_vn100"] = df["ticker"].isin(vn100)
+    df["is_hnx30"] = df["ticker"].isin(hnx30)
+
+    # nhóm theo ngành
+    df_icb = _call(listing.symbols_by_industries)
+    df = df.merge(
+        df_icb[["symbol", "icb_name2", "icb_name3"]],
+        left_on="ticker",
+        right_on="symbol",
+        how="left"
+    )
+    df = df.drop(columns={'symbol'})
+    df = df.rename(columns={'icb_name3': 'subindustry', 'icb_name2': 'industry'})
+
+    df["date_fetched"] = datetime.now()
+    return df[UNIVERSE_COLUMNS]
+
+
+def _snapshot_path() -> str:
+    return VNSTOCK_CONFIG["universe_path"]
+
+
+def _snapshot_age(path: str) -> float | None:
+    try:
+        return time.time() - os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def save_snapshot(df: pd.DataFrame):
+    """Ghi snapshot local (ghi file tạm rồi rename, không để lại file dở)."""
+    path = _snapshot_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def load_universe(refresh: bool = False) -> pd.DataFrame:
+    """
+    Universe hiện tại:
+    - cache trong process, rồi snapshot local nếu chưa quá TTL
+    - hết hạn / refresh=True → gọi API và ghi snapshot mới
+    - API lỗi mà còn snapshot cũ → dùng tạm snapshot cũ
+
+    Phiên bản của universe = cột date_fetched.
+    """
+    ttl = VNSTOCK_CONFIG["universe_ttl_hours"] * 3600
+    path = _snapshot_path()
+
+    with _CACHE_LOCK:
+        if (
+            not refresh
+            and _CACHE["df"] is not None
+            and time.time() - _CACHE["loaded_at"] < ttl
+        ):
+            return _CACHE["df"]
+
+        age = _snapshot_age(path)
+        if not refresh and age is not None and age < ttl:
+            df = pd.read_parquet(path)
+        else:
+            try:
+                df = fetch_universe()
+                save_snapshot(df)
+                age = 0.0
+            except Exception as e:
+                if age is None:
+                    raise
+                logger.warning(
+                    f"Universe refresh failed ({e}), use snapshot {age / 3600:.1f}h old"
+                )
+                df = pd.read_parquet(path)
+
+        # TTL tính theo lúc snapshot được ghi, không theo lúc process đọc
+        _CACHE["df"] = df
+        _CACHE["loaded_at"] = time.time() - age
+        return df
+
+
+def get_stock_list() -> list[str]:
+    return load_universe()["ticker"].tolist()
@@ -22,6 +22,11 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException,
 
 import logging
 
+from etl_pipeline.ops.api.cassette import install_cassette
+
+# HTTP_CASSETTE_MODE != off → requests.get bài viết đi qua cassette
+install_cassette()
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
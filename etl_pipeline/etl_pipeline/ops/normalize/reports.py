@@ -1,41 +1,7 @@
-from vnstock import Finance, Listing
 import pandas as pd
 import numpy as np
 
-def get_stock_list():
-    listing = Listing(source='VCI')
-
-    df = pd.DataFrame(listing.symbols_by_exchange())
-    df = df[df["type"].str.contains("STOCK", na=False)].reset_index(drop=True)
-
-    df = df.rename(columns={
-        "symbol": "ticker",
-        "organ_short_name": "name",
-        "exchange": "trading_floor"
-    })
-
-    df = df[['ticker', 'name', 'trading_floor']]
-
-    # nhóm theo vốn hóa
-    vn30 = listing.symbols_by_group('VN30')
-    vn100 = listing.symbols_by_group('VN100')
-    hnx30 = listing.symbols_by_group('HNX30')
-    df["is_vn30"] = df["ticker"].isin(vn30)
-    df["is_vn100"] = df["ticker"].isin(vn100)
-    df["is_hnx30"] = df["ticker"].isin(hnx30)
-
-    # nhóm theo ngành
-    df_icb = listing.symbols_by_industries()
-    df = df.merge(
-        df_icb[["symbol", "icb_name2", "icb_name3"]],
-        left_on="ticker",
-        right_on="symbol",
-        how="left"
-    )
-    df = df.drop(columns={'symbol'})
-    df = df.rename(columns={'icb_name3': 'subindustry', 'icb_name2': 'industry'})
-    
-    return df
+from etl_pipeline.ops.api.universe import load_universe
 
 def normalize_reports(df: pd.DataFrame, report_type: str = 'is') -> list[tuple[pd.DataFrame, list[str]]]:
     df['report_type'] = df['report_type'].str.upper()
@@ -179,7 +145,7 @@ def normalize_reports(df: pd.DataFrame, report_type: str = 'is') -> list[tuple[p
         return
 
     # --- split bank / non-bank TRƯỚC ---
-    df_list = get_stock_list()
+    df_list = load_universe()
     bank_tickers = set(df_list.loc[df_list["subindustry"] == "Ngân hàng", "ticker"])
 
     df_bank = df[df["ticker"].isin(bank_tickers)].copy()
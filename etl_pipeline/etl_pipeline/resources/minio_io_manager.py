@@ -1,8 +1,53 @@
-from dagster import IOManager, OutputContext, InputContext
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+import fcntl
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+import time
+
+from dagster import IOManager, OutputContext, InputContext, MetadataValue
 from minio import Minio
+from minio.commonconfig import CopySource
+from minio.error import S3Error
 import pandas as pd
-import os
-import tempfile
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from .partition_cache import PartitionCache
+
+
+@dataclass(frozen=True)
+class PassThrough:
+    """
+    Tham chiếu tới object Parquet của input (không tải dữ liệu).
+
+    Asset pass-through trả lại nguyên object này, IO manager sẽ copy
+    server-side sang vị trí của output thay vì decode/encode.
+    """
+
+    object_name: str
+    num_rows: int
+    size: int
+    etag: str
+
+    def __len__(self):
+        return self.num_rows
+
+
+# mã lỗi S3 nghĩa là object thật sự không tồn tại (các lỗi khác: 503,
+# mất kết nối, ... phải raise tiếp, không được coi là "không có")
+NOT_FOUND_CODES = ("NoSuchKey", "NoSuchObject")
+
+
+def _not_found(exc: Exception) -> bool:
+    return isinstance(exc, S3Error) and exc.code in NOT_FOUND_CODES
 
 
 class MinIOIOManager(IOManager):
@@ -15,7 +60,25 @@ class MinIOIOManager(IOManager):
             secure=config.get("secure", False),
             region="us-east-1",
         )
-    
+
+        # Cache đọc trên đĩa local (tắt nếu không cấu hình cache_dir)
+        self._cache = None
+        if config.get("cache_dir"):
+            self._cache = PartitionCache(
+                config["cache_dir"],
+                config.get("cache_max_bytes", 2 * 1024 ** 3),
+            )
+
+        # ETag đã biết trong process hiện tại (≈ 1 run) → không cần stat lại
+        self._etags = {}
+        self._etags_lock = threading.Lock()
+
+        # khoá read-modify-write manifest theo từng asset
+        self._manifest_locks = {}
+        self._manifest_locks_guard = threading.Lock()
+        # manifest đã đọc trong process (dùng để resolve partition đã compact)
+        self._manifests = {}
+
     def _resolve_object_path(self, asset_key, partition_key=None) -> str:
         """
         asset_key.path = [layer, schema?, table]
@@ -37,19 +100,223 @@ class MinIOIOManager(IOManager):
 
         return f"{base}.parquet"
 
-    def _tmp_file(self, asset_key, partition_key=None):
-        name = asset_key.path[-1]
-        suffix = f"_{partition_key}" if partition_key else ""
-        return os.path.join(
-            tempfile.gettempdir(),
-            f"{name}{suffix}.parquet",
+    # =====================================================
+    # 🔹 TRANSFER (in-memory, không ghi file tạm)
+    # =====================================================
+    def _put_table(self, object_name: str, table: pa.Table, sort_by=None) -> dict:
+        """
+        Encode Table → Parquet trong Arrow buffer rồi upload thẳng
+        bằng put_object (1 lần truyền mạng, 0 lần ghi đĩa local).
+        Trả về entry manifest của object vừa ghi.
+
+        Dữ liệu được sort (mặc định theo ticker) và chia row group cỡ
+        `row_group_size` để min/max statistics của từng row group đủ hẹp
+        cho filter pushdown lúc đọc.
+        """
+        buf = self._encode_table(table, sort_by=sort_by)
+        return self._upload(object_name, buf, rows=table.num_rows)
+
+    def _encode_table(self, table: pa.Table, sort_by=None) -> pa.Buffer:
+        sort_by = sort_by or self._config.get("sort_by", ["ticker"])
+        sort_keys = [c for c in sort_by if c in table.column_names]
+        if sort_keys:
+            table = table.sort_by([(c, "ascending") for c in sort_keys])
+
+        sink = pa.BufferOutputStream()
+        pq.write_table(
+            table,
+            sink,
+            row_group_size=self._config.get("row_group_size", 50_000),
         )
+        return sink.getvalue()
+
+    def _upload(self, object_name: str, buf: pa.Buffer, rows: int) -> dict:
+        result = self.client.put_object(
+            bucket_name=self._config["bucket_name"],
+            object_name=object_name,
+            data=pa.BufferReader(buf),
+            length=buf.size,
+            content_type="application/parquet",
+        )
+
+        self._remember_etag(object_name, result.etag)
+        if self._cache is not None:
+            self._cache.put(object_name, result.etag, buf)
+
+        return {
+            "rows": rows,
+            "bytes": buf.size,
+            "etag": result.etag,
+        }
+
+    def _get_table(self, object_name: str, columns=None, filters=None) -> pa.Table:
+        """
+        Lấy object (từ cache local nếu còn đúng ETag) rồi decode Parquet
+        trực tiếp từ bộ nhớ.
+
+        columns/filters được đẩy xuống Parquet reader: chỉ decode các cột cần,
+        row group nào bị loại bởi statistics thì bỏ qua luôn.
+        """
+        source = pa.BufferReader(self._fetch_object(object_name))
+
+        if columns is not None:
+            # partition cũ có thể thiếu cột → chỉ đọc các cột có trong file
+            available = set(pq.read_schema(source).names)
+            columns = [c for c in columns if c in available]
+            source.seek(0)
+
+        return pq.read_table(source, columns=columns, filters=filters)
+
+    def _fetch_object(self, object_name: str):
+        if self._cache is None:
+            data, _ = self._download(object_name)
+            return data
+
+        etag = self._object_etag(object_name)
+        buf = self._cache.get(object_name, etag)
+        if buf is not None:
+            return buf
+
+        data, etag = self._download(object_name)
+        self._cache.put(object_name, etag, data)
+        return data
+
+    def _download(self, object_name: str):
+        try:
+            response = self.client.get_object(
+                self._config["bucket_name"],
+                object_name,
+            )
+        except S3Error as e:
+            if _not_found(e):
+                raise FileNotFoundError(object_name) from e
+            raise
+
+        try:
+            data = response.read()
+            etag = (response.headers.get("ETag") or "").strip('"')
+        finally:
+            response.close()
+            response.release_conn()
+
+        self._remember_etag(object_name, etag)
+        return data, etag
+
+    # =====================================================
+    # 🔹 DATAFRAME TYPES (pandas / pyarrow / polars)
+    # =====================================================
+    DATAFRAME_TYPES = ("pandas", "pyarrow", "polars")
+
+    @staticmethod
+    def _to_arrow(obj) -> pa.Table:
+        """
+        pandas / pyarrow / polars → pa.Table (polars không cần import:
+        nhận diện qua module của object rồi gọi .to_arrow()).
+        """
+        if isinstance(obj, pa.Table):
+            return obj
+        if isinstance(obj, pd.DataFrame):
+            return pa.Table.from_pandas(obj, preserve_index=False)
+        if type(obj).__module__.startswith("polars"):
+            return obj.to_arrow()
+
+        raise TypeError(
+            f"MinIOIOManager không hỗ trợ kiểu output {type(obj).__name__}"
+        )
+
+    @classmethod
+    def _from_arrow(cls, table: pa.Table, dataframe_type: str = "pandas"):
+        if dataframe_type not in cls.DATAFRAME_TYPES:
+            raise ValueError(
+                f"dataframe_type phải là một trong {cls.DATAFRAME_TYPES}, "
+                f"nhận được '{dataframe_type}'"
+            )
+
+        if dataframe_type == "pyarrow":
+            return table
+        if dataframe_type == "polars":
+            # polars là dependency tuỳ chọn → chỉ import khi asset yêu cầu
+            try:
+                import polars as pl
+            except ImportError as e:
+                raise ImportError(
+                    "dataframe_type='polars' cần cài thêm package polars"
+                ) from e
+            return pl.from_arrow(table)
+
+        return table.to_pandas()
+
+    @staticmethod
+    def _read_options(metadata) -> dict:
+        """
+        Đọc `columns` / `filters` từ AssetIn metadata.
+
+        filters theo cú pháp pyarrow: [(col, op, value), ...] (AND) hoặc
+        [[...], [...]] (OR của các nhóm AND).
+        """
+        columns = metadata.get("columns")
+        filters = metadata.get("filters")
+
+        if filters:
+            if isinstance(filters[0][0], (list, tuple)):
+                filters = [[tuple(f) for f in group] for group in filters]
+            else:
+                filters = [tuple(f) for f in filters]
+
+        return {
+            "columns": list(columns) if columns else None,
+            "filters": filters or None,
+        }
+
+    # =====================================================
+    # 🔹 ETAG / CACHE STATS
+    # =====================================================
+    def _remember_etag(self, object_name: str, etag: str | None):
+        if not etag:
+            return
+        with self._etags_lock:
+            self._etags[object_name] = etag
+
+    def _object_etag(self, object_name: str) -> str:
+        """
+        ETag hiện tại của object: lấy từ bộ nhớ nếu đã thấy trong process này,
+        nếu không thì stat_object (HEAD, rẻ hơn GET nhiều).
+        """
+        with self._etags_lock:
+            etag = self._etags.get(object_name)
+        if etag:
+            return etag
+
+        try:
+            stat = self.client.stat_object(
+                self._config["bucket_name"],
+                object_name,
+            )
+        except S3Error as e:
+            if _not_found(e):
+                raise FileNotFoundError(object_name) from e
+            raise
+
+        self._remember_etag(object_name, stat.etag)
+        return stat.etag
+
+    def _cache_metadata(self, reset: bool = False) -> dict:
+        if self._cache is None:
+            return {}
+        stats = self._cache.stats()
+        if reset:
+            self._cache.reset_stats()
+        return stats
 
     # =====================================================
     # 🔹 OUTPUT
     # =====================================================
-    def handle_output(self, context: OutputContext, obj: pd.DataFrame):
-        if obj is None or obj.empty:
+    def handle_output(self, context: OutputContext, obj):
+        """
+        obj có thể là pandas.DataFrame, pyarrow.Table hoặc polars.DataFrame;
+        pyarrow/polars được ghi thẳng sang Parquet, không đi qua pandas.
+        """
+        if obj is None or len(obj) == 0:
             context.log.info("No data to write")
             return
 
@@ -58,26 +325,73 @@ class MinIOIOManager(IOManager):
         object_name = self._resolve_object_path(
             context.asset_key, partition_key
         )
-        tmp_path = self._tmp_file(context.asset_key, partition_key)
 
-        obj.to_parquet(tmp_path, index=False)
+        table = None
+        if isinstance(obj, PassThrough):
+            entry = self._copy_object(obj, object_name)
+            context.add_output_metadata({"pass_through_source": obj.object_name})
+        else:
+            table = self._to_arrow(obj)
+            entry = self._put_table(
+                object_name,
+                table,
+                sort_by=(context.metadata or {}).get("sort_by"),
+            )
+        if partition_key:
+            self._update_manifest(context.asset_key, {partition_key: entry})
 
-        self.client.fput_object(
-            bucket_name=self._config["bucket_name"],
-            object_name=object_name,
-            file_path=tmp_path,
-            content_type="application/parquet",
-        )
+            activity_column = (context.metadata or {}).get("activity_column")
+            if activity_column and table is not None:
+                self.update_activity(
+                    context.asset_key,
+                    activity_column,
+                    {partition_key: self._distinct(table, activity_column)},
+                )
+
+        # hit/miss của các lần đọc trong lúc asset chạy (vd. load_partition)
+        cache_metadata = self._cache_metadata(reset=True)
+        if cache_metadata:
+            context.add_output_metadata(cache_metadata)
 
         context.log.info(f"Written to MinIO: {object_name}")
-        os.remove(tmp_path)
 
     # =====================================================
     # 🔹 INPUT
     # =====================================================
-    def load_input(self, context: InputContext) -> pd.DataFrame:
+    def load_input(self, context: InputContext):
+        """
+        Mặc định trả về pandas.DataFrame; AssetIn metadata
+        `dataframe_type="pyarrow" | "polars"` để nhận Arrow Table / Polars
+        DataFrame (không qua pandas).
+        """
+        metadata = context.metadata or {}
+
+        # asset pass-through: chỉ trả về tham chiếu, không tải object
+        if metadata.get("pass_through"):
+            ref = self._pass_through_ref(context)
+            if ref is not None:
+                context.add_input_metadata({
+                    "pass_through": True,
+                    "source_object": ref.object_name,
+                })
+                return ref
+            context.log.info("Pass-through không áp dụng được, load bình thường")
+
+        before = self._cache_metadata()
+        dataframe_type = metadata.get("dataframe_type", "pandas")
+        df = self._from_arrow(self._load_input(context), dataframe_type)
+
+        if before:
+            after = self._cache_metadata()
+            context.add_input_metadata(
+                {k: after[k] - before[k] for k in after}
+            )
+        return df
+
+    def _load_input(self, context: InputContext) -> pa.Table:
         metadata = context.metadata or {}
         load_all_partitions = metadata.get("load_all_partitions", False)
+        read_options = self._read_options(metadata)
 
         # ==============================
         # CASE 3: partitioned → unpartitioned (merge)
@@ -88,21 +402,28 @@ class MinIOIOManager(IOManager):
                 context.asset_key
             )
 
-            dfs = []
-            for pk in sorted(partitions):
-                try:
-                    df = self.load_partition(context.asset_key, pk)
-                    df["_partition_key"] = pk
-                    dfs.append(df)
-                except FileNotFoundError:
-                    continue
+            tables, timings, loaded = self._load_partition_tables(
+                context.asset_key, sorted(partitions), **read_options
+            )
 
-            if not dfs:
+            if not tables:
                 raise FileNotFoundError(
                     f"No partitions found for asset {context.asset_key}"
                 )
 
-            return pd.concat(dfs, ignore_index=True)
+            # 1 file compact chứa nhiều partition, file ngày ghi lại sau khi
+            # compact nằm ở group riêng → sort lại (stable) theo partition
+            table = self._concat_tables(tables)
+            if len(tables) > 1:
+                table = table.sort_by([("_partition_key", "ascending")])
+
+            context.add_input_metadata({
+                "partitions_loaded": len(loaded),
+                "partitions_missing": len(partitions) - len(loaded),
+                "load_concurrency": self._load_concurrency,
+                "partition_load_seconds": MetadataValue.json(timings),
+            })
+            return table
 
         # ==============================
         # CASE 2: unpartitioned asset
@@ -111,110 +432,1025 @@ class MinIOIOManager(IOManager):
             object_name = self._resolve_object_path(
                 context.asset_key, partition_key=None
             )
-            tmp_path = self._tmp_file(context.asset_key, None)
-
-            try:
-                self.client.fget_object(
-                    bucket_name=self._config["bucket_name"],
-                    object_name=object_name,
-                    file_path=tmp_path,
-                )
-            except Exception:
-                raise FileNotFoundError(object_name)
-
-            df = pd.read_parquet(tmp_path)
-            os.remove(tmp_path)
-            return df
+            return self._get_table(object_name, **read_options)
 
         # ==============================
         # CASE 1: partitioned → partitioned
         # + fallback to unpartitioned
         # ==============================
         try:
-            return self.load_partition(
-                context.asset_key, context.partition_key
+            return self._read_partition_table(
+                context.asset_key, context.partition_key, **read_options
             )
         except FileNotFoundError:
             # fallback: load unpartitioned asset
             object_name = self._resolve_object_path(
                 context.asset_key, partition_key=None
             )
-            tmp_path = self._tmp_file(context.asset_key, None)
 
             try:
-                self.client.fget_object(
-                    bucket_name=self._config["bucket_name"],
-                    object_name=object_name,
-                    file_path=tmp_path,
-                )
-            except Exception:
+                table = self._get_table(object_name, **read_options)
+            except FileNotFoundError:
                 raise FileNotFoundError(
                     f"No partition '{context.partition_key}' "
                     f"and no unpartitioned file for asset {context.asset_key}"
                 )
 
-            df = pd.read_parquet(tmp_path)
-            os.remove(tmp_path)
-
             # optional: gắn partition_key hiện tại
-            df["_partition_key"] = context.partition_key
-            return df
+            return table.append_column(
+                "_partition_key",
+                pa.array([context.partition_key] * table.num_rows, pa.string()),
+            )
 
 
     # =====================================================
-    # 🔹 PARTITION HELPERS
+    # 🔹 PASS-THROUGH (server-side copy)
     # =====================================================
-    def list_partitions(self, asset_key):
-        prefix = self._resolve_object_path(asset_key).replace(".parquet", "") + "/"
+    def _pass_through_ref(self, context: InputContext) -> PassThrough | None:
+        """
+        PassThrough của input nếu có thể copy nguyên object; None nếu phải
+        load bình thường (fan-in, có columns/filters, partition đã compact
+        vào file tháng/năm, hoặc object không tồn tại).
+        """
+        metadata = context.metadata or {}
+        if metadata.get("load_all_partitions") or any(
+            self._read_options(metadata).values()
+        ):
+            return None
+
+        rows = None
+        if context.has_partition_key:
+            object_name, compacted = self._partition_location(
+                context.asset_key, context.partition_key
+            )
+            if compacted:
+                return None
+            manifest = self._cached_manifest(context.asset_key) or {}
+            rows = (
+                manifest.get("partitions", {})
+                .get(context.partition_key, {})
+                .get("rows")
+            )
+        else:
+            object_name = self._resolve_object_path(context.asset_key)
+
+        try:
+            stat = self.client.stat_object(
+                self._config["bucket_name"],
+                object_name,
+            )
+        except Exception:
+            return None
+
+        etag = (stat.etag or "").strip('"')
+        self._remember_etag(object_name, etag)
+        if rows is None:
+            rows = self._read_row_count(object_name, stat.size)
 
-        objects = self.client.list_objects(
+        return PassThrough(
+            object_name=object_name,
+            num_rows=rows,
+            size=stat.size,
+            etag=etag,
+        )
+
+    def _copy_object(self, ref: PassThrough, object_name: str) -> dict:
+        result = self.client.copy_object(
             self._config["bucket_name"],
-            prefix=prefix,
-            recursive=True,
+            object_name,
+            CopySource(self._config["bucket_name"], ref.object_name),
         )
+        etag = (result.etag or "").strip('"')
+        self._remember_etag(object_name, etag)
 
-        partitions = []
-        for obj in objects:
-            if obj.object_name.endswith(".parquet"):
-                partitions.append(
-                    obj.object_name.split("/")[-1].replace(".parquet", "")
-                )
+        return {
+            "rows": ref.num_rows,
+            "bytes": ref.size,
+            "etag": etag,
+        }
+
+    # =====================================================
+    # 🔹 PARTITION FAN-IN
+    # =====================================================
+    @property
+    def _load_concurrency(self) -> int:
+        return max(1, int(self._config.get("load_concurrency", 8)))
+
+    def _load_partition_tables(self, asset_key, partitions, columns=None, filters=None):
+        """
+        Download + decode nhiều partition song song (thread pool giới hạn),
+        theo thứ tự group (object chứa partition), caller tự sort theo
+        `_partition_key` nếu cần. Partition không tồn tại bị bỏ qua.
+        Các partition nằm chung 1 file compact chỉ tốn 1 lần đọc.
 
-        return sorted(partitions)
+        Returns: (list[pa.Table], {partition_key: seconds},
+                  list partition_key đã load được)
+        """
+        # gom partition theo object chứa nó (file ngày hoặc file compact)
+        groups = {}
+        for pk in partitions:
+            object_name, compacted = self._partition_location(asset_key, pk)
+            groups.setdefault((object_name, compacted), []).append(pk)
+
+        def _load(group):
+            (object_name, compacted), pks = group
+            started = time.perf_counter()
+            try:
+                if compacted:
+                    table = self._get_table(
+                        object_name,
+                        columns=self._with_partition_column(columns),
+                        filters=self._and_filter(
+                            filters, ("_partition_key", "in", pks)
+                        ),
+                    ).sort_by([("_partition_key", "ascending")])
+                else:
+                    table = self._get_table(
+                        object_name, columns=columns, filters=filters
+                    )
+                    table = table.append_column(
+                        "_partition_key",
+                        pa.array([pks[0]] * table.num_rows, type=pa.string()),
+                    )
+            except FileNotFoundError:
+                return pks, None, time.perf_counter() - started
+            return pks, table, time.perf_counter() - started
 
-    def load_partition(self, asset_key, partition_key) -> pd.DataFrame:
-        object_name = self._resolve_object_path(asset_key, partition_key)
-        tmp_path = self._tmp_file(asset_key, partition_key)
+        with ThreadPoolExecutor(max_workers=self._load_concurrency) as ex:
+            results = list(ex.map(_load, groups.items()))
 
+        tables = [t for _, t, _ in results if t is not None]
+        timings = {
+            ",".join(pks) if len(pks) == 1 else f"{pks[0]}..{pks[-1]}":
+                round(seconds, 3)
+            for pks, t, seconds in results
+            if t is not None
+        }
+        loaded = sorted(pk for pks, t, _ in results if t is not None for pk in pks)
+        return tables, timings, loaded
+
+    @staticmethod
+    def _concat_tables(tables) -> pa.Table:
+        """
+        Gộp bằng 1 lần concat Arrow; schema lệch nhau giữa các partition
+        (thiếu cột / khác kiểu số) được promote. Nếu Arrow không hợp nhất được
+        kiểu thì fallback về pd.concat như trước.
+        """
+        tables = MinIOIOManager._align_string_columns(tables)
         try:
-            self.client.fget_object(
-                self._config["bucket_name"],
-                object_name,
-                tmp_path,
+            return pa.concat_tables(tables, promote_options="permissive")
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df = pd.concat(
+                [t.to_pandas() for t in tables],
+                ignore_index=True,
             )
-        except Exception:
-            raise FileNotFoundError(object_name)
+            return pa.Table.from_pandas(df, preserve_index=False)
 
-        df = pd.read_parquet(tmp_path)
-        os.remove(tmp_path)
-        return df
-    
-    def write_partition(self, asset_key, partition_key, df: pd.DataFrame):
+    @staticmethod
+    def _align_string_columns(tables) -> list:
+        """
+        Cột mà partition này lưu string, partition khác lưu date/timestamp
+        (vd. `date` của bronze prices: incremental ghi "YYYY-MM-DD", full
+        load / backfill cũ ghi timestamp) → đưa hết về string cùng định dạng.
+        Arrow không promote string ↔ timestamp, còn pd.concat thì ra cột
+        object lẫn Timestamp / str mà from_pandas không encode được.
+        """
+        types = {}
+        for t in tables:
+            for field in t.schema:
+                if not pa.types.is_null(field.type):
+                    types.setdefault(field.name, set()).add(field.type)
+
+        mixed = {
+            name for name, found in types.items()
+            if len(found) > 1
+            and any(pa.types.is_string(x) or pa.types.is_large_string(x) for x in found)
+        }
+        if not mixed:
+            return tables
+
+        aligned = []
+        for t in tables:
+            for name in mixed & set(t.column_names):
+                col = t.column(name)
+                if pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
+                    continue
+                if pa.types.is_timestamp(col.type):
+                    midnight = pc.all(
+                        pc.equal(pc.floor_temporal(col, unit="day"), col)
+                    ).as_py()
+                    col = (
+                        pc.cast(pc.cast(col, pa.date32()), pa.string())
+                        if midnight is not False
+                        else pc.strftime(
+                            pc.cast(col, pa.timestamp("s", col.type.tz), safe=False),
+                            format="%Y-%m-%d %H:%M:%S",
+                        )
+                    )
+                else:
+                    col = pc.cast(col, pa.string())
+                t = t.set_column(t.column_names.index(name), name, col)
+            aligned.append(t)
+        return aligned
+
+    @staticmethod
+    def _and_filter(filters, extra: tuple):
+        if not filters:
+            return [extra]
+        if isinstance(filters[0], list):
+            return [group + [extra] for group in filters]
+        return list(filters) + [extra]
+
+    @staticmethod
+    def _with_partition_column(columns):
+        if columns is None:
+            return None
+        return list(columns) + ["_partition_key"]
+
+    # =====================================================
+    # 🔹 PARTITION HELPERS
+    # =====================================================
+    def list_partitions(self, asset_key):
+        """
+        Danh sách partition lấy từ manifest (1 GET nhỏ). Nếu asset chưa có
+        manifest thì scan list_objects một lần rồi lưu manifest lại.
+        """
+        manifest = self.read_manifest(asset_key)
+        if manifest is None:
+            with self._manifest_lock(asset_key):
+                # run khác có thể vừa dựng xong manifest trong lúc chờ khoá
+                manifest = self.read_manifest(asset_key)
+                if manifest is None:
+                    manifest = self.rebuild_manifest(asset_key, row_counts=False)
+
+        return sorted(manifest["partitions"])
+
+    def load_partition(
+        self, asset_key, partition_key, columns=None, filters=None
+    ) -> pd.DataFrame:
+        return self._read_partition_table(
+            asset_key, partition_key, columns=columns, filters=filters
+        ).to_pandas()
+
+    def _read_partition_table(
+        self, asset_key, partition_key, columns=None, filters=None
+    ) -> pa.Table:
+        """
+        Đọc 1 partition; nếu partition đã được compact vào file tháng/năm thì
+        chỉ đọc lát cắt `_partition_key == partition_key` của file đó.
+        """
+        object_name, compacted = self._partition_location(asset_key, partition_key)
+        if not compacted:
+            return self._get_table(object_name, columns=columns, filters=filters)
+
+        table = self._get_table(
+            object_name,
+            columns=columns,
+            filters=self._and_filter(
+                filters, ("_partition_key", "=", partition_key)
+            ),
+        )
+        if "_partition_key" in table.column_names:
+            table = table.drop_columns(["_partition_key"])
+        return table
+
+    def _partition_location(self, asset_key, partition_key):
+        """
+        (object_name, compacted) của partition theo manifest.
+        """
+        manifest = self._cached_manifest(asset_key)
+        entry = (manifest or {}).get("partitions", {}).get(partition_key) or {}
+
+        if entry.get("object"):
+            return f"{self._base_path(asset_key)}/{entry['object']}", True
+        return self._resolve_object_path(asset_key, partition_key), False
+
+    def write_partition(
+        self, asset_key, partition_key, df: pd.DataFrame, activity_column=None
+    ):
         base_path = self._resolve_object_path(asset_key).replace(".parquet", "")
         object_name = f"{base_path}/{partition_key}.parquet"
 
-        tmp_file = os.path.join(
-            tempfile.gettempdir(),
-            f"{asset_key.path[-1]}_{partition_key}.parquet"
+        table = self._to_arrow(df)
+        entry = self._put_table(object_name, table)
+        self._update_manifest(asset_key, {partition_key: entry})
+        if activity_column:
+            self.update_activity(
+                asset_key,
+                activity_column,
+                {partition_key: self._distinct(table, activity_column)},
+            )
+
+    def write_partitions(
+        self, asset_key, frames, sort_by=None, log=None, activity_column=None
+    ) -> dict:
+        """
+        Ghi nhiều partition một lượt (full load).
+
+        frames: iterable các cặp (partition_key, frame). Mỗi frame được
+        encode trong worker pool rồi upload song song; tổng số byte đang
+        upload bị giới hạn bởi `max_in_flight_bytes`. Manifest (và activity
+        index nếu có `activity_column`) chỉ cập nhật 1 lần ở cuối, kể cả
+        khi có lỗi, với các partition đã ghi xong.
+
+        Returns: {partition_key: {"rows", "bytes", "etag"}}
+        """
+        workers = max(1, int(self._config.get("write_concurrency", 8)))
+        budget = _ByteBudget(
+            int(self._config.get("max_in_flight_bytes", 256 * 1024 ** 2))
         )
+        written = {}
+        seen = {}
+
+        def _write(pk, df):
+            table = self._to_arrow(df)
+            if activity_column:
+                seen[pk] = self._distinct(table, activity_column)
+            buf = self._encode_table(table, sort_by=sort_by)
+            with budget.reserve(buf.size):
+                entry = self._upload(
+                    self._resolve_object_path(asset_key, pk),
+                    buf,
+                    rows=table.num_rows,
+                )
+            return pk, entry
+
+        started = time.perf_counter()
+        futures = []
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                pending = set()
+                for pk, df in frames:
+                    # giữ tối đa 2×workers frame trong bộ nhớ cùng lúc
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for fut in done:
+                            fut.result()  # có lỗi → dừng submit thêm
+
+                    fut = ex.submit(_write, pk, df)
+                    futures.append(fut)
+                    pending.add(fut)
+
+            for fut in futures:
+                fut.result()
+        finally:
+            # executor đã chờ hết các upload đang chạy → gom mọi partition
+            # ghi thành công (kể cả khi partition khác lỗi) vào manifest
+            for fut in futures:
+                if fut.done() and not fut.cancelled() and fut.exception() is None:
+                    pk, entry = fut.result()
+                    written[pk] = entry
+
+            if written:
+                self._update_manifest(asset_key, written)
+                if activity_column:
+                    self.update_activity(
+                        asset_key,
+                        activity_column,
+                        {pk: seen[pk] for pk in written},
+                    )
+
+        if log:
+            total_bytes = sum(e["bytes"] for e in written.values())
+            log.info(
+                f"Batch write {len(written)} partitions | "
+                f"{total_bytes / 1024 ** 2:.1f} MiB in "
+                f"{time.perf_counter() - started:.1f}s"
+            )
+
+        return written
+
+    # =====================================================
+    # 🔹 PARTITION MANIFEST
+    # =====================================================
+    # {base}/_manifest.json:
+    # {
+    #   "version": 1,
+    #   "updated_at": "...",
+    #   "partitions": {
+    #       "<partition_key>": {"rows": int, "bytes": int, "etag": str},
+    #       # partition đã compact: nằm trong file tháng/năm
+    #       "<partition_key>": {"rows": int, "etag": str,
+    #                           "object": "_compacted/monthly/2024-03.parquet"},
+    #   }
+    # }
+    # Mỗi lần ghi partition, manifest được ghi đè bằng 1 PUT (atomic trên
+    # MinIO). Read-modify-write giữ _manifest_lock (flock trên host) để 2 run
+    # song song không ghi đè mất entry của nhau. Nếu manifest lệch / mất →
+    # rebuild_manifest() dựng lại từ list_objects (job rebuild_partition_manifests).
+    MANIFEST_VERSION = 1
+
+    def _base_path(self, asset_key) -> str:
+        return self._resolve_object_path(asset_key).replace(".parquet", "")
+
+    def _manifest_object(self, asset_key) -> str:
+        return f"{self._base_path(asset_key)}/_manifest.json"
+
+    @contextmanager
+    def _file_lock(self, name: str):
+        """
+        Khoá theo `name` giữa các thread (threading.Lock) và giữa các
+        process trên host (flock trên file trong `lock_dir`): mỗi step
+        Dagster chạy trong process riêng, tối đa 3 run song song.
+        Process chết thì OS tự nhả flock.
+        """
+        with self._manifest_locks_guard:
+            lock = self._manifest_locks.setdefault(name, threading.Lock())
+
+        with lock:
+            lock_dir = self._config.get("lock_dir")
+            if not lock_dir:
+                yield
+                return
+
+            os.makedirs(lock_dir, exist_ok=True)
+            path = os.path.join(
+                lock_dir, f"{hashlib.sha1(name.encode()).hexdigest()}.lock"
+            )
+            with open(path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _manifest_lock(self, asset_key):
+        """Khoá read-modify-write các file JSON / _latest của asset."""
+        return self._file_lock(self._manifest_object(asset_key))
 
-        df.to_parquet(tmp_file, index=False)
+    def _get_json(self, object_name: str):
+        try:
+            response = self.client.get_object(
+                self._config["bucket_name"],
+                object_name,
+            )
+        except S3Error as e:
+            # lỗi mạng / 503 mà trả None sẽ bị hiểu là chưa có manifest
+            if _not_found(e):
+                return None
+            raise
+
+        try:
+            return json.loads(response.read())
+        finally:
+            response.close()
+            response.release_conn()
 
-        self.client.fput_object(
+    def _put_json(self, object_name: str, payload: dict):
+        data = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode()
+        return self.client.put_object(
             bucket_name=self._config["bucket_name"],
             object_name=object_name,
-            file_path=tmp_file,
-            content_type="application/parquet",
+            data=io.BytesIO(data),
+            length=len(data),
+            content_type="application/json",
         )
 
-        os.remove(tmp_file)
+    def read_manifest(self, asset_key) -> dict | None:
+        manifest = self._get_json(self._manifest_object(asset_key))
+        self._manifests[self._manifest_object(asset_key)] = manifest
+        return manifest
+
+    def _cached_manifest(self, asset_key) -> dict | None:
+        key = self._manifest_object(asset_key)
+        if key not in self._manifests:
+            return self.read_manifest(asset_key)
+        return self._manifests[key]
+
+    def _write_manifest(self, asset_key, partitions: dict) -> dict:
+        manifest = {
+            "version": self.MANIFEST_VERSION,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "partitions": partitions,
+        }
+        self._put_json(self._manifest_object(asset_key), manifest)
+        self._manifests[self._manifest_object(asset_key)] = manifest
+        return manifest
+
+    def _update_manifest(self, asset_key, entries: dict, removed=()) -> dict:
+        """
+        Read-modify-write manifest: thêm/ghi đè `entries`, xoá `removed`.
+        """
+        with self._manifest_lock(asset_key):
+            manifest = self.read_manifest(asset_key)
+            if manifest is None:
+                # chưa có manifest → scan một lần để không làm mất partition cũ
+                manifest = self.rebuild_manifest(asset_key, row_counts=False)
+
+            partitions = dict(manifest["partitions"])
+            partitions.update(entries)
+            for pk in removed:
+                partitions.pop(pk, None)
+
+            return self._write_manifest(asset_key, partitions)
+
+    def rebuild_manifest(self, asset_key, row_counts: bool = True) -> dict:
+        """
+        Dựng lại manifest từ list_objects (dùng để recovery).
+        row_counts=True đọc footer Parquet (range GET) để lấy số dòng.
+        """
+        prefix = f"{self._base_path(asset_key)}/"
+
+        objects = []
+        compacted = []
+        for obj in self.client.list_objects(
+            self._config["bucket_name"],
+            prefix=prefix,
+            recursive=True,
+        ):
+            name = obj.object_name[len(prefix):]
+            if not name.endswith(".parquet"):
+                continue
+            if name.startswith(f"{self.COMPACTED_DIR}/"):
+                compacted.append(obj)
+            # chỉ lấy partition trực tiếp, bỏ qua file nội bộ (_staging, ...)
+            elif "/" not in name and not name.startswith("_"):
+                objects.append(obj)
+
+        def _entry(obj):
+            entry = {
+                "rows": None,
+                "bytes": obj.size,
+                "etag": (obj.etag or "").strip('"'),
+            }
+            if row_counts:
+                entry["rows"] = self._read_row_count(obj.object_name, obj.size)
+            return obj.object_name[len(prefix):-len(".parquet")], entry
+
+        def _compacted_entries(obj):
+            keys = self._get_table(
+                obj.object_name, columns=["_partition_key"]
+            ).column("_partition_key").value_counts()
+            return {
+                item["values"].as_py(): {
+                    "rows": item["counts"].as_py(),
+                    "etag": (obj.etag or "").strip('"'),
+                    "object": obj.object_name[len(prefix):],
+                }
+                for item in keys
+            }
+
+        with ThreadPoolExecutor(max_workers=self._load_concurrency) as ex:
+            # file năm trước file tháng → file mới hơn (tháng, ngày) ghi đè sau
+            partitions = {}
+            for entries in ex.map(
+                _compacted_entries,
+                sorted(compacted, key=lambda o: "monthly" in o.object_name),
+            ):
+                partitions.update(entries)
+            partitions.update(dict(ex.map(_entry, objects)))
+
+        return self._write_manifest(asset_key, partitions)
+
+    # =====================================================
+    # 🔹 ACTIVITY INDEX
+    # =====================================================
+    # {base}/_activity.json:
+    # {
+    #   "version": 1,
+    #   "updated_at": "...",
+    #   "column": "ticker",
+    #   "last_seen": {"<ticker>": "<partition_key mới nhất có mã này>"},
+    # }
+    # Cập nhật mỗi lần ghi partition của asset có `activity_column`, để
+    # detect_inactive_symbols chỉ cần đọc 1 file JSON nhỏ thay vì tải lại
+    # các partition gần nhất. Partition key (YYYY-MM-DD / YYYY-Qn) so sánh
+    # được theo thứ tự chuỗi.
+    ACTIVITY_VERSION = 1
+
+    def _activity_object(self, asset_key) -> str:
+        return f"{self._base_path(asset_key)}/_activity.json"
+
+    @staticmethod
+    def _distinct(table: pa.Table, column: str) -> list:
+        if column not in table.column_names:
+            return []
+        return [v for v in pc.unique(table.column(column)).to_pylist() if v is not None]
+
+    def read_activity(self, asset_key) -> dict | None:
+        return self._get_json(self._activity_object(asset_key))
+
+    def update_activity(self, asset_key, column: str, seen: dict) -> dict:
+        """
+        Read-modify-write activity index.
+        seen: {partition_key: iterable giá trị của `column` có trong partition}
+        """
+        with self._manifest_lock(asset_key):
+            activity = self.read_activity(asset_key) or {}
+            last_seen = dict(activity.get("last_seen", {}))
+
+            for pk, values in seen.items():
+                for value in values:
+                    if last_seen.get(value, "") < pk:
+                        last_seen[value] = pk
+
+            activity = {
+                "version": self.ACTIVITY_VERSION,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+                "column": column,
+                "last_seen": last_seen,
+            }
+            self._put_json(self._activity_object(asset_key), activity)
+            return activity
+
+    def _read_range(self, object_name: str, offset: int, length: int) -> bytes:
+        response = self.client.get_object(
+            self._config["bucket_name"],
+            object_name,
+            offset=offset,
+            length=length,
+        )
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _read_row_count(self, object_name: str, size: int) -> int:
+        """
+        Đọc số dòng từ footer Parquet bằng range GET (không tải cả file).
+        """
+        tail = self._read_range(object_name, size - 8, 8)
+        footer_len = struct.unpack("<I", tail[:4])[0]
+        footer = self._read_range(object_name, size - 8 - footer_len, footer_len)
+
+        # magic + footer là đủ để pyarrow đọc metadata
+        metadata = pq.read_metadata(pa.BufferReader(b"PAR1" + footer + tail))
+        return metadata.num_rows
+
+    # =====================================================
+    # 🔹 STAGING + CHECKPOINT (full load resume được)
+    # =====================================================
+    # {base}/_staging/batch-00001.parquet, ...: dữ liệu đã fetch theo lô
+    # {base}/_staging/_checkpoint.json:
+    # {
+    #   "version": 1,
+    #   "started_at": "...", "updated_at": "...",
+    #   "batches": ["batch-00001.parquet", ...],
+    #   "done": ["AAA", ...],       # ticker đã có trong staging
+    #   "skipped": ["BBB", ...],    # ticker không có dữ liệu / lỗi ở lần chạy trước
+    # }
+    # Batch được ghi trước, checkpoint sau: crash giữa 2 bước chỉ để lại
+    # 1 batch mồ côi, lần chạy sau ghi đè đúng tên đó. Khi dọn thì ngược
+    # lại: checkpoint xoá trước, batch sau. Staging dùng chung theo asset →
+    # full load giữ full_load_lock() để 2 run không ghi chồng batch của nhau.
+    STAGING_DIR = "_staging"
+    CHECKPOINT_VERSION = 1
+
+    def _staging_prefix(self, asset_key) -> str:
+        return f"{self._base_path(asset_key)}/{self.STAGING_DIR}/"
+
+    def _checkpoint_object(self, asset_key) -> str:
+        return f"{self._staging_prefix(asset_key)}_checkpoint.json"
+
+    def read_checkpoint(self, asset_key) -> dict | None:
+        return self._get_json(self._checkpoint_object(asset_key))
+
+    def full_load_lock(self, asset_key):
+        """
+        Khoá full load của asset (giữa các run trên host): run đến sau chờ
+        run trước xong rồi mới kiểm tra lại partition / checkpoint.
+        """
+        return self._file_lock(self._staging_prefix(asset_key))
+
+    def write_staging_batch(self, asset_key, df, done, skipped=()) -> dict:
+        """
+        Ghi 1 lô vào staging rồi cập nhật checkpoint.
+        done: ticker của lô đã fetch xong; skipped: ticker không có dữ liệu.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        checkpoint = self.read_checkpoint(asset_key) or {
+            "version": self.CHECKPOINT_VERSION,
+            "started_at": now,
+            "batches": [],
+            "done": [],
+            "skipped": [],
+        }
+
+        batches = list(checkpoint["batches"])
+        if df is not None and len(df):
+            name = f"batch-{len(batches) + 1:05d}.parquet"
+            self._put_table(
+                f"{self._staging_prefix(asset_key)}{name}", self._to_arrow(df)
+            )
+            batches.append(name)
+
+        done = set(checkpoint["done"]) | set(done)
+        checkpoint = {
+            **checkpoint,
+            "updated_at": now,
+            "batches": batches,
+            "done": sorted(done),
+            "skipped": sorted((set(checkpoint["skipped"]) | set(skipped)) - done),
+        }
+        self._put_json(self._checkpoint_object(asset_key), checkpoint)
+        return checkpoint
+
+    def load_staging(self, asset_key, log=None) -> pd.DataFrame:
+        """Toàn bộ batch trong checkpoint; batch không còn trên MinIO bị bỏ qua."""
+        checkpoint = self.read_checkpoint(asset_key)
+        if not checkpoint or not checkpoint["batches"]:
+            return pd.DataFrame()
+
+        prefix = self._staging_prefix(asset_key)
+
+        def _load(object_name):
+            try:
+                return self._get_table(object_name)
+            except FileNotFoundError:
+                return None
+
+        objects = [f"{prefix}{name}" for name in checkpoint["batches"]]
+        with ThreadPoolExecutor(max_workers=self._load_concurrency) as ex:
+            tables = list(ex.map(_load, objects))
+
+        missing = [o for o, t in zip(objects, tables) if t is None]
+        if missing and log:
+            log.warning(f"Staging batches missing, skipped: {missing}")
+
+        tables = [t for t in tables if t is not None]
+        if not tables:
+            return pd.DataFrame()
+        return self._concat_tables(tables).to_pandas()
+
+    def clear_staging(self, asset_key):
+        """
+        Xoá staging (kể cả batch mồ côi). Checkpoint xoá trước: partition đã
+        ghi xong, crash giữa chừng chỉ để lại batch mồ côi chứ không để lại
+        checkpoint trỏ tới batch đã mất (run sau sẽ kẹt ở chế độ resume).
+        """
+        self.client.remove_object(
+            self._config["bucket_name"], self._checkpoint_object(asset_key)
+        )
+        for obj in self.client.list_objects(
+            self._config["bucket_name"],
+            prefix=self._staging_prefix(asset_key),
+            recursive=True,
+        ):
+            self.client.remove_object(self._config["bucket_name"], obj.object_name)
+
+    # =====================================================
+    # 🔹 INTRADAY LOG (micro-batch → partition ngày)
+    # =====================================================
+    # {base}/_intraday/{partition_key}/{batch_id}.parquet: mỗi lần poll
+    # trong phiên ghi thêm 1 file nhỏ (append-only, không đụng manifest).
+    # Hết phiên, compact_intraday() gộp thành partition ngày bình thường.
+    # {base}/_latest.parquet: bar mới nhất của từng ticker (1 GET là đủ).
+    INTRADAY_DIR = "_intraday"
+
+    def _intraday_prefix(self, asset_key, partition_key) -> str:
+        return f"{self._base_path(asset_key)}/{self.INTRADAY_DIR}/{partition_key}/"
+
+    def _latest_object(self, asset_key) -> str:
+        return f"{self._base_path(asset_key)}/_latest.parquet"
+
+    def append_intraday(self, asset_key, partition_key, df, batch_id=None) -> dict:
+        """
+        Ghi 1 micro-batch; batch_id mặc định theo giờ ghi (sort được).
+        """
+        batch_id = batch_id or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        return self._put_table(
+            f"{self._intraday_prefix(asset_key, partition_key)}{batch_id}.parquet",
+            self._to_arrow(df),
+        )
+
+    def list_intraday(self, asset_key, partition_key) -> list[str]:
+        return sorted(
+            obj.object_name
+            for obj in self.client.list_objects(
+                self._config["bucket_name"],
+                prefix=self._intraday_prefix(asset_key, partition_key),
+            )
+            if obj.object_name.endswith(".parquet")
+        )
+
+    def load_intraday(self, asset_key, partition_key) -> pd.DataFrame:
+        objects = self.list_intraday(asset_key, partition_key)
+        if not objects:
+            return pd.DataFrame()
+
+        with ThreadPoolExecutor(max_workers=self._load_concurrency) as ex:
+            tables = list(ex.map(self._get_table, objects))
+        return self._concat_tables(tables).to_pandas()
+
+    def compact_intraday(
+        self, asset_key, partition_key, unique_key=None, sort_by=None, log=None
+    ) -> dict | None:
+        """
+        Gộp micro-batch của 1 ngày thành partition `partition_key`
+        (dedup theo unique_key, giữ bản ghi mới nhất), cập nhật manifest
+        rồi xoá micro-batch.
+        """
+        objects = self.list_intraday(asset_key, partition_key)
+        if not objects:
+            return None
+
+        # partition đã compact trước đó (chạy lại sau giờ đóng cửa) → gộp tiếp
+        try:
+            existing = self.load_partition(asset_key, partition_key)
+        except FileNotFoundError:
+            existing = pd.DataFrame()
+
+        df = pd.concat(
+            [existing, self.load_intraday(asset_key, partition_key)],
+            ignore_index=True,
+        )
+        if unique_key:
+            df = df.drop_duplicates(subset=unique_key, keep="last")
+
+        entry = self._put_table(
+            self._resolve_object_path(asset_key, partition_key),
+            self._to_arrow(df.reset_index(drop=True)),
+            sort_by=sort_by,
+        )
+        self._update_manifest(asset_key, {partition_key: entry})
+
+        for object_name in objects:
+            self.client.remove_object(self._config["bucket_name"], object_name)
+
+        if log:
+            log.info(
+                f"Compacted {len(objects)} micro-batches → {partition_key} "
+                f"({entry['rows']} rows)"
+            )
+        return entry
+
+    def read_latest(self, asset_key) -> pd.DataFrame:
+        try:
+            return self._get_table(self._latest_object(asset_key)).to_pandas()
+        except FileNotFoundError:
+            return pd.DataFrame()
+
+    def update_latest(self, asset_key, df, key="ticker", time_column="time") -> pd.DataFrame:
+        """
+        Gộp `df` vào snapshot bar mới nhất theo `key`; cùng `time_column`
+        thì bản trong `df` (poll sau) thay bản cũ.
+        """
+        with self._manifest_lock(asset_key):
+            latest = pd.concat([self.read_latest(asset_key), df], ignore_index=True)
+            latest = (
+                latest.sort_values(time_column, kind="stable")
+                .drop_duplicates(subset=key, keep="last")
+                .sort_values(key)
+                .reset_index(drop=True)
+            )
+            self._put_table(self._latest_object(asset_key), self._to_arrow(latest))
+        return latest
+
+    # =====================================================
+    # 🔹 COMPACTION (daily → monthly → yearly)
+    # =====================================================
+    COMPACTED_DIR = "_compacted"
+
+    def compact_partitions(self, asset_key, today: date | None = None, log=None) -> dict:
+        """
+        Gộp các partition ngày (YYYY-MM-DD) của tháng đã đóng thành
+        1 file/tháng, và của năm đã đóng thành 1 file/năm, sort theo ticker.
+        Manifest trỏ partition ngày → file compact; load_partition đọc đúng
+        lát cắt nên asset phía sau không cần biết partition đã bị gộp.
+
+        Returns: {compacted_object: số partition}
+        """
+        today = today or datetime.now(timezone(timedelta(hours=7))).date()
+        current_month = today.strftime("%Y-%m")
+        current_year = today.strftime("%Y")
+        manifest = self.read_manifest(asset_key) or {"partitions": {}}
+
+        # partition ngày của tháng/năm đã đóng → file đích
+        targets = {}
+        for pk, entry in manifest["partitions"].items():
+            try:
+                day = datetime.strptime(pk, "%Y-%m-%d").date()
+            except ValueError:
+                continue
+
+            month, year = day.strftime("%Y-%m"), day.strftime("%Y")
+            if month >= current_month:
+                continue
+
+            if year < current_year:
+                target = f"{self.COMPACTED_DIR}/yearly/{year}.parquet"
+            else:
+                target = f"{self.COMPACTED_DIR}/monthly/{month}.parquet"
+            targets.setdefault(target, []).append(pk)
+
+        base = self._base_path(asset_key)
+        written = {}
+        for target, pks in sorted(targets.items()):
+            pks = sorted(pks)
+            old_locations = {
+                manifest["partitions"][pk].get("object") for pk in pks
+            }
+            if old_locations == {target}:
+                continue  # đã compact đúng chỗ
+
+            # lỗi đọc (≠ NoSuchKey) raise luôn; ngày không còn object thì
+            # không có trong `loaded` → không được trỏ sang file compact
+            tables, _, loaded = self._load_partition_tables(asset_key, pks)
+            if not tables:
+                continue
+
+            entry = self._put_table(
+                f"{base}/{target}",
+                self._concat_tables(tables),
+                sort_by=["ticker", "_partition_key"],
+            )
+            counts = {
+                item["values"].as_py(): item["counts"].as_py()
+                for item in pa.concat_tables(
+                    [t.select(["_partition_key"]) for t in tables]
+                ).column("_partition_key").value_counts()
+            }
+            # đổi manifest + xoá file cũ trong khoá: ngày nào bị ghi lại trong
+            # lúc compact (backfill, recompute gold) thì giữ nguyên, không xoá
+            with self._manifest_lock(asset_key):
+                current = dict(
+                    (self.read_manifest(asset_key) or {"partitions": {}})["partitions"]
+                )
+                switched = [
+                    pk for pk in loaded
+                    if self._unchanged_since(
+                        asset_key, pk, manifest["partitions"][pk], current.get(pk)
+                    )
+                ]
+                for pk in switched:
+                    current[pk] = {
+                        "rows": counts.get(pk, 0),
+                        "etag": entry["etag"],
+                        "object": target,
+                    }
+                if switched:
+                    self._write_manifest(asset_key, current)
+
+                # manifest đã trỏ sang file mới → xoá file ngày / file tháng cũ
+                # (file tháng chỉ xoá khi không còn partition nào trỏ tới)
+                still_used = {e.get("object") for e in current.values()}
+                stale = [
+                    self._resolve_object_path(asset_key, pk)
+                    for pk in switched
+                    if not manifest["partitions"][pk].get("object")
+                ]
+                stale += [
+                    f"{base}/{location}"
+                    for location in old_locations - {target, None} - still_used
+                ]
+                for object_name in stale:
+                    self.client.remove_object(
+                        self._config["bucket_name"], object_name
+                    )
+
+            skipped = len(pks) - len(switched)
+            written[target] = len(switched)
+            if log:
+                log.info(
+                    f"Compacted {len(switched)} partitions → {base}/{target} "
+                    f"({entry['rows']} rows, {entry['bytes']} bytes)"
+                    + (f", skip {skipped} rewritten during compaction" if skipped else "")
+                )
+
+        return written
+
+    def _unchanged_since(self, asset_key, partition_key, before, current) -> bool:
+        """
+        Partition chưa bị ghi lại kể từ lúc compaction đọc manifest: entry
+        trong manifest giữ nguyên, và (với partition ngày) object trên MinIO
+        vẫn đúng ETag đó — bắt cả run đã PUT nhưng chưa kịp cập nhật manifest.
+        """
+        if current != before:
+            return False
+        if before.get("object"):
+            return True
+
+        try:
+            stat = self.client.stat_object(
+                self._config["bucket_name"],
+                self._resolve_object_path(asset_key, partition_key),
+            )
+        except Exception:
+            return False
+        return (stat.etag or "").strip('"') == (before.get("etag") or "").strip('"')
+
+
+class _ByteBudget:
+    """
+    Giới hạn tổng số byte đang upload cùng lúc. Object lớn hơn cả ngân sách
+    vẫn được đi (một mình) để không bị treo.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        with self._cond:
+            while self.used and self.used + nbytes > self.limit:
+                self._cond.wait()
+            self.used += nbytes
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.used -= nbytes
+                self._cond.notify_all()
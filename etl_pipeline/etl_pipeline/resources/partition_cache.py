@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+import uuid
+
+import pyarrow as pa
+
+
+class PartitionCache:
+    """
+    Cache Parquet object trên đĩa local, key = (object_name, ETag).
+
+    - Object đổi nội dung → ETag đổi → key mới, bản cũ tự bị LRU đẩy ra.
+    - Ghi file tạm rồi os.replace nên nhiều process dùng chung thư mục an toàn.
+    - LRU theo mtime: mỗi lần hit "chạm" lại file, khi vượt `max_bytes`
+      thì xoá file cũ nhất cho tới khi còn ~90% ngân sách.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_bytes)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self.reset_stats()
+
+    # =====================================================
+    # 🔹 STATS
+    # =====================================================
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.bytes_hit = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "cache_bytes_served": self.bytes_hit,
+            }
+
+    # =====================================================
+    # 🔹 READ / WRITE
+    # =====================================================
+    def _path(self, object_name: str, etag: str) -> str:
+        digest = hashlib.sha256(f"{object_name}:{etag}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.parquet")
+
+    def get(self, object_name: str, etag: str):
+        """
+        Trả về pa.Buffer nếu hit, None nếu miss.
+        """
+        path = self._path(object_name, etag)
+        try:
+            with pa.memory_map(path) as source:
+                buf = source.read_buffer()
+            os.utime(path)
+        except (FileNotFoundError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self.bytes_hit += buf.size
+        return buf
+
+    def put(self, object_name: str, etag: str, data) -> None:
+        if not etag:
+            return
+
+        path = self._path(object_name, etag)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        size = len(data) if isinstance(data, (bytes, bytearray)) else data.size
+
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(memoryview(data))
+            os.replace(tmp_path, path)
+        except OSError:
+            # cache chỉ là tối ưu → lỗi đĩa không được làm hỏng run
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += size
+
+            if self._total_bytes > self.max_bytes:
+                self._total_bytes = self._evict(int(self.max_bytes * 0.9))
+
+    # =====================================================
+    # 🔹 LRU
+    # =====================================================
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".parquet"):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _scan_total(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self, target_bytes: int) -> int:
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+        return total
+
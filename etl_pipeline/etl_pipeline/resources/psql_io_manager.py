@@ -1,99 +1,833 @@
 from contextlib import contextmanager
+from datetime import date, timedelta
+import io
+import threading
+import time
+import uuid
 import pandas as pd
+import pyarrow as pa
 from dagster import IOManager, OutputContext, InputContext
 from sqlalchemy import create_engine, text
 import logging
 
+from .warehouse_schema import TableSchema, cast_frame, get_table_schema, infer_pg_type
+
 logging.basicConfig(level=logging.INFO)
 logs = logging.getLogger("psql_io_manager")
 
 
+# =====================================================
+# 🔹 ENGINE POOL (dùng chung trong process)
+# =====================================================
+_ENGINES = {}
+_ENSURED_SCHEMAS = set()
+_ENGINES_LOCK = threading.Lock()
+
+
+def _engine_key(config) -> tuple:
+    return (config["host"], config["port"], config["database"], config["user"])
+
+
+def get_engine(config):
+    """
+    1 engine (connection pool) cho mỗi bộ thông tin kết nối, sống suốt
+    process → các lần handle_output liên tiếp dùng lại connection sẵn có.
+    """
+    key = _engine_key(config)
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            conn_info = (
+                f"postgresql+psycopg2://{config['user']}:{config['password']}"
+                f"@{config['host']}:{config['port']}/{config['database']}"
+            )
+            engine = create_engine(
+                conn_info,
+                pool_size=int(config.get("pool_size", 5)),
+                max_overflow=int(config.get("max_overflow", 5)),
+                pool_pre_ping=True,
+                pool_recycle=1800,
+            )
+            _ENGINES[key] = engine
+        return engine
+
+
 @contextmanager
 def connect_psql(config, schema: str):
-    conn_info = (
-        f"postgresql+psycopg2://{config['user']}:{config['password']}"
-        f"@{config['host']}:{config['port']}/{config['database']}"
-    )
-    engine = create_engine(conn_info)
+    engine = get_engine(config)
 
-    with engine.begin() as conn:
-        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+    # CREATE SCHEMA chỉ chạy 1 lần / schema / process
+    key = (*_engine_key(config), schema)
+    if key not in _ENSURED_SCHEMAS:
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+        _ENSURED_SCHEMAS.add(key)
 
     yield engine
 
 
+def quote_ident(name: str) -> str:
+    # tên cột từ bronze có thể viết hoa / có dấu cách ("CP", "Năm", ...)
+    return '"' + str(name).replace('"', '""') + '"'
+
+
 class PostgreSQLIOManager(IOManager):
+    # hash nội dung từng dòng (hash_diff) → chỉ gửi dòng mới / thay đổi
+    HASH_COLUMN = "_row_hash"
+    # cột thay đổi mỗi lần crawl (không phải nội dung) → không đưa vào hash
+    HASH_EXCLUDE = ("date_fetched",)
+
     def __init__(self, config):
         self._config = config
+        # bảng / unique index đã chắc chắn tồn tại → không cần kiểm tra lại
+        self._ensured_tables = set()
+        self._ensured_indexes = set()
+        self._ensured_partitions = set()
+
+    # =====================================================
+    # 🔹 INPUT (đọc warehouse theo chunk, server-side cursor)
+    # =====================================================
+    FILTER_OPS = {"=", "==", "!=", "<", "<=", ">", ">=", "in", "not in"}
+
+    def load_input(self, context: InputContext):
+        """
+        AssetIn metadata:
+          - columns: danh sách cột cần đọc
+          - filters: [(col, op, value), ...] (AND) hoặc [[...], [...]] (OR)
+          - chunk_size: số dòng / chunk (mặc định `read_chunk_rows`)
+          - stream: True → trả về generator các chunk (bộ nhớ bị chặn
+            theo chunk_size), False → gộp thành 1 frame
+          - dataframe_type: "pandas" (mặc định) hoặc "pyarrow"
+            (stream → pa.RecordBatch, không stream → pa.Table)
+        """
+        metadata = context.metadata or {}
+        schema = context.asset_key.path[0]
+        table = context.asset_key.path[-1]
+
+        sql, params = self._select_sql(
+            schema,
+            table,
+            columns=metadata.get("columns"),
+            filters=metadata.get("filters"),
+        )
+        chunk_size = int(
+            metadata.get("chunk_size")
+            or self._config.get("read_chunk_rows", 50_000)
+        )
+        dataframe_type = metadata.get("dataframe_type", "pandas")
+
+        context.add_input_metadata({
+            "table": f"{schema}.{table}",
+            "chunk_size": chunk_size,
+        })
+
+        chunks = self._iter_chunks(sql, params, schema, chunk_size)
+        if dataframe_type == "pyarrow":
+            chunks = self._iter_batches(chunks, self._arrow_types(schema, table))
+
+        if metadata.get("stream"):
+            return chunks
+
+        if dataframe_type == "pyarrow":
+            batches = list(chunks)
+            return pa.Table.from_batches(batches) if batches else pa.table({})
+
+        frames = list(chunks)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
 
-    def load_input(self, context: InputContext) -> pd.DataFrame:
-        raise NotImplementedError()
+    def _iter_chunks(self, sql: str, params: dict, schema: str, chunk_size: int):
+        # giữ connection tới khi đọc hết → stream_results = named cursor (psycopg2)
+        with connect_psql(self._config, schema) as engine:
+            with engine.connect() as conn:
+                conn = conn.execution_options(
+                    stream_results=True,
+                    max_row_buffer=chunk_size,
+                )
+                yield from pd.read_sql(
+                    text(sql), conn, params=params, chunksize=chunk_size
+                )
+
+    # kiểu Postgres (format_type, bỏ phần "(...)") → kiểu Arrow
+    ARROW_TYPES = {
+        "smallint": pa.int16(),
+        "integer": pa.int32(),
+        "bigint": pa.int64(),
+        "real": pa.float32(),
+        "double precision": pa.float64(),
+        "numeric": pa.float64(),
+        "boolean": pa.bool_(),
+        "text": pa.string(),
+        "character varying": pa.string(),
+        "character": pa.string(),
+        "date": pa.date32(),
+        "timestamp without time zone": pa.timestamp("ns"),
+        "timestamp with time zone": pa.timestamp("ns", tz="UTC"),
+    }
+
+    def _arrow_types(self, schema: str, table: str) -> dict:
+        """{cột: kiểu Arrow} theo kiểu khai báo của bảng (cột không map được bị bỏ qua)."""
+        with connect_psql(self._config, schema) as engine:
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    text(
+                        "SELECT a.attname, format_type(a.atttypid, a.atttypmod) "
+                        "FROM pg_attribute a "
+                        "WHERE a.attrelid = to_regclass(:table) "
+                        "AND a.attnum > 0 AND NOT a.attisdropped"
+                    ),
+                    {"table": f"{schema}.{table}"},
+                ).all()
+
+        types = {}
+        for name, pg_type in rows:
+            arrow_type = self.ARROW_TYPES.get(pg_type.split("(")[0])
+            if arrow_type is not None:
+                types[name] = arrow_type
+        return types
+
+    @staticmethod
+    def _iter_batches(chunks, arrow_types: dict):
+        """
+        pandas chunk → pa.RecordBatch, mọi batch cùng 1 schema: lấy từ chunk
+        đầu, cột có kiểu trong bảng thì theo kiểu của bảng. Suy kiểu riêng
+        từng chunk thì cột toàn NULL thành kiểu null → lệch schema giữa các batch.
+        """
+        schema = None
+        for chunk in chunks:
+            if schema is None:
+                inferred = pa.Schema.from_pandas(chunk, preserve_index=False)
+                schema = pa.schema([
+                    pa.field(
+                        field.name,
+                        arrow_types.get(field.name)
+                        or (pa.string() if pa.types.is_null(field.type) else field.type),
+                    )
+                    for field in inferred
+                ])
+            yield pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+
+    @classmethod
+    def _select_sql(cls, schema, table, columns=None, filters=None):
+        cols = ", ".join(quote_ident(c) for c in columns) if columns else "*"
+        sql = f"SELECT {cols} FROM {schema}.{table}"
+        params = {}
+
+        if not filters:
+            return sql, params
+
+        # chuẩn hoá về dạng OR của các nhóm AND
+        groups = filters if isinstance(filters[0][0], (list, tuple)) else [filters]
+
+        or_clauses = []
+        for group in groups:
+            and_clauses = []
+            for col, op, value in group:
+                op = op.lower()
+                if op not in cls.FILTER_OPS:
+                    raise ValueError(f"Filter op không hỗ trợ: {op}")
+
+                name = f"p{len(params)}"
+                if op in ("in", "not in"):
+                    and_clauses.append(
+                        f"{quote_ident(col)} {'!=' if op == 'not in' else '='} "
+                        f"{'ALL' if op == 'not in' else 'ANY'}(:{name})"
+                    )
+                    params[name] = list(value)
+                else:
+                    sql_op = "=" if op == "==" else op
+                    and_clauses.append(f"{quote_ident(col)} {sql_op} :{name}")
+                    params[name] = value
+            or_clauses.append("(" + " AND ".join(and_clauses) + ")")
+
+        return f"{sql} WHERE " + " OR ".join(or_clauses), params
 
     def handle_output(self, context: OutputContext, obj: pd.DataFrame):
         table = context.asset_key.path[-1]
         schema = context.asset_key.path[0]
 
-        # lấy unique_key từ metadata của asset output
-        unique_key = (context.output_metadata or {}).get("unique_key")
+        # lấy unique_key / partition_by / hash_diff từ metadata của asset output
+        unique_key = self._metadata_value(context, "unique_key")
+        partition_by = self._metadata_value(context, "partition_by")
+        hash_diff = self._metadata_value(context, "hash_diff")
+        delete_missing = self._metadata_value(context, "delete_missing")
+        hash_exclude = self._metadata_value(context, "hash_exclude")
 
-        # convert Dagster metadata value -> python object
-        if unique_key is not None and hasattr(unique_key, "value"):
-            unique_key = unique_key.value
+        # bảng có schema khai báo → ép kiểu frame, lấy key / partition từ schema
+        table_schema = get_table_schema(schema, table)
+        if table_schema is not None:
+            obj = cast_frame(obj, table_schema)
+            unique_key = unique_key or list(table_schema.primary_key) or None
+            partition_by = partition_by or table_schema.partition_by
+
+        if hash_diff:
+            obj = self._with_row_hash(obj, exclude=hash_exclude)
+            # bảng không có key tự nhiên → dùng chính hash làm key
+            unique_key = unique_key or [self.HASH_COLUMN]
 
         context.log.info(f"Writing to table {schema}.{table}")
         if unique_key:
             context.log.info(f"Dedup enabled with unique_key={unique_key}")
 
-        with connect_psql(self._config, schema) as engine:
-            with engine.begin() as conn:
-
-                # 1) dedup trong dataframe
-                if unique_key:
-                    obj = obj.drop_duplicates(subset=unique_key, keep="last")
-
-                if not unique_key:
-                    # fallback: append bình thường
-                    obj.to_sql(
-                        table,
-                        con=conn,
-                        schema=schema,
-                        if_exists="append",
-                        index=False,
+        # 1) dedup trong dataframe
+        if unique_key:
+            obj = obj.drop_duplicates(subset=unique_key, keep="last")
+
+        started = time.perf_counter()
+        diff_metadata = {}
+
+        try:
+            with connect_psql(self._config, schema) as engine:
+                checkout_started = time.perf_counter()
+                with engine.connect() as conn, conn.begin():
+                    checkout_wait = time.perf_counter() - checkout_started
+
+                    # 2) bảng đích chưa có → tạo theo schema (hoặc dtypes
+                    #    của frame); partition_by → partition theo tháng
+                    self._ensure_table(
+                        conn, obj, schema, table, partition_by, table_schema
                     )
-                    return
+                    if unique_key:
+                        self._ensure_unique_index(conn, schema, table, unique_key)
+
+                    # 3) hash_diff: bỏ các dòng đã có nguyên vẹn trong bảng
+                    if hash_diff:
+                        obj, diff_metadata = self._diff_rows(
+                            conn, obj, schema, table, unique_key, delete_missing
+                        )
+
+                    # 4) COPY → staging → merge
+                    if not obj.empty:
+                        self._load_frame(
+                            conn, obj, schema, table, unique_key, partition_by
+                        )
+        except Exception:
+            # transaction rollback → bảng / index / partition có thể chưa được tạo
+            self._forget_table(schema, table)
+            raise
+
+        elapsed = time.perf_counter() - started
+        context.add_output_metadata({
+            "rows_written": len(obj),
+            "load_seconds": round(elapsed, 3),
+            "rows_per_sec": round(len(obj) / elapsed, 1) if elapsed else None,
+            "pool_checkout_seconds": round(checkout_wait, 4),
+            "pool_status": engine.pool.status(),
+            **diff_metadata,
+        })
+
+        context.log.info(f"Done write {schema}.{table}, rows={len(obj)}")
+
+    @staticmethod
+    def _metadata_value(context: OutputContext, key: str):
+        value = (context.output_metadata or {}).get(key)
+
+        # convert Dagster metadata value -> python object
+        if value is not None and hasattr(value, "value"):
+            value = value.value
+        return value
+
+    def _forget_table(self, schema: str, table: str):
+        self._ensured_tables.discard((schema, table))
+        self._ensured_indexes = {
+            k for k in self._ensured_indexes if k[:2] != (schema, table)
+        }
+        self._ensured_partitions = {
+            k for k in self._ensured_partitions if k[:2] != (schema, table)
+        }
 
-                # 2) tạo temp table
-                temp_table = f"__tmp_{table}"
-                conn.execute(text(f"DROP TABLE IF EXISTS {schema}.{temp_table}"))
+    def _ensure_table(
+        self,
+        conn,
+        df: pd.DataFrame,
+        schema: str,
+        table: str,
+        partition_by=None,
+        table_schema: TableSchema | None = None,
+    ):
+        if (schema, table) not in self._ensured_tables:
+            relkind = conn.execute(
+                text(
+                    "SELECT c.relkind FROM pg_class c "
+                    "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                    "WHERE n.nspname = :schema AND c.relname = :table"
+                ),
+                {"schema": schema, "table": table},
+            ).scalar()
 
-                obj.to_sql(
-                    temp_table,
+            if relkind is None and table_schema is not None:
+                self._create_table(conn, df, schema, table, table_schema)
+                relkind = "p" if table_schema.partition_by else "r"
+            elif relkind is None:
+                df.head(0).to_sql(
+                    table,
                     con=conn,
                     schema=schema,
-                    if_exists="replace",
                     index=False,
                 )
+            elif table_schema is not None:
+                self._migrate_table(
+                    conn, df, schema, table, table_schema, partitioned=relkind == "p"
+                )
+            elif self.HASH_COLUMN in df.columns:
+                # bảng có từ trước khi bật hash_diff
+                conn.execute(text(
+                    f"ALTER TABLE {schema}.{table} ADD COLUMN IF NOT EXISTS "
+                    f"{quote_ident(self.HASH_COLUMN)} BIGINT"
+                ))
+            # "p" = partitioned table; bảng heap cũ → chuyển sang partition
+            if partition_by and relkind != "p":
+                self._migrate_to_partitioned(conn, schema, table, partition_by)
+
+            if table_schema is not None:
+                for columns in table_schema.indexes:
+                    index_name = f"ix_{table}_{'_'.join(columns)}"[:63]
+                    cols = ", ".join(quote_ident(c) for c in columns)
+                    conn.execute(text(
+                        f"CREATE INDEX IF NOT EXISTS {index_name} "
+                        f"ON {schema}.{table} ({cols})"
+                    ))
+
+            self._ensured_tables.add((schema, table))
+
+        if partition_by:
+            for month_start in self._partition_months(df, partition_by):
+                self._ensure_range_partition(
+                    conn, schema, table, partition_by, month_start
+                )
+
+    # =====================================================
+    # 🔹 SCHEMA (tạo / migrate theo warehouse_schema)
+    # =====================================================
+    @staticmethod
+    def _extra_columns(df: pd.DataFrame, table_schema: TableSchema) -> dict:
+        # cột trong frame nhưng không khai báo → suy kiểu từ dtype
+        return {
+            c: infer_pg_type(df[c].dtype)
+            for c in df.columns
+            if table_schema.column(c) is None
+        }
+
+    def _create_table(
+        self, conn, df: pd.DataFrame, schema: str, table: str, table_schema: TableSchema
+    ):
+        definitions = [
+            f"{quote_ident(c.name)} {c.type}" + ("" if c.nullable else " NOT NULL")
+            for c in table_schema.columns
+        ]
+        definitions += [
+            f"{quote_ident(c)} {pg_type}"
+            for c, pg_type in self._extra_columns(df, table_schema).items()
+        ]
+        if table_schema.primary_key:
+            pk = ", ".join(quote_ident(c) for c in table_schema.primary_key)
+            definitions.append(f"PRIMARY KEY ({pk})")
+
+        sql = f"CREATE TABLE {schema}.{table} (\n    " + ",\n    ".join(definitions) + "\n)"
+        if table_schema.partition_by:
+            sql += f" PARTITION BY RANGE ({quote_ident(table_schema.partition_by)})"
+
+        logs.info(f"Creating table {schema}.{table} from schema registry")
+        conn.execute(text(sql))
+
+        if table_schema.partition_by:
+            conn.execute(text(
+                f"CREATE TABLE {schema}.{table}_default "
+                f"PARTITION OF {schema}.{table} DEFAULT"
+            ))
+
+    def _migrate_table(
+        self,
+        conn,
+        df: pd.DataFrame,
+        schema: str,
+        table: str,
+        table_schema: TableSchema,
+        partitioned: bool = False,
+    ):
+        """
+        Đưa bảng đang có về đúng schema: thêm cột thiếu, đổi kiểu cột lệch
+        (ALTER ... USING col::type), đặt NOT NULL nếu dữ liệu cho phép.
+        """
+        current = {
+            name: (pg_type, not_null)
+            for name, pg_type, not_null in conn.execute(
+                text(
+                    "SELECT a.attname, format_type(a.atttypid, a.atttypmod), "
+                    "a.attnotnull FROM pg_attribute a "
+                    "WHERE a.attrelid = to_regclass(:table) "
+                    "AND a.attnum > 0 AND NOT a.attisdropped"
+                ),
+                {"table": f"{schema}.{table}"},
+            )
+        }
+
+        wanted = {c.name: c.type for c in table_schema.columns}
+        wanted.update(self._extra_columns(df, table_schema))
+
+        for name, pg_type in wanted.items():
+            col = quote_ident(name)
+            if name not in current:
+                conn.execute(text(
+                    f"ALTER TABLE {schema}.{table} ADD COLUMN {col} {pg_type}"
+                ))
+                continue
+
+            # chỉ đổi kiểu cột có khai báo; cột suy kiểu giữ nguyên
+            if table_schema.column(name) is None or current[name][0] == pg_type:
+                continue
+            if partitioned and name == table_schema.partition_by:
+                logs.warning(
+                    f"Cannot change type of partition key {schema}.{table}.{name} "
+                    f"({current[name][0]} → {pg_type})"
+                )
+                continue
+
+            logs.info(
+                f"Migrating {schema}.{table}.{name}: {current[name][0]} → {pg_type}"
+            )
+            conn.execute(text(
+                f"ALTER TABLE {schema}.{table} ALTER COLUMN {col} "
+                f"TYPE {pg_type} USING {col}::{pg_type}"
+            ))
+
+        for column in table_schema.columns:
+            if column.nullable or current.get(column.name, (None, False))[1]:
+                continue
+            col = quote_ident(column.name)
+            has_null = conn.execute(text(
+                f"SELECT EXISTS (SELECT 1 FROM {schema}.{table} WHERE {col} IS NULL)"
+            )).scalar()
+            if not has_null:
+                conn.execute(text(
+                    f"ALTER TABLE {schema}.{table} ALTER COLUMN {col} SET NOT NULL"
+                ))
+
+    # =====================================================
+    # 🔹 RANGE PARTITION (theo tháng)
+    # =====================================================
+    def _migrate_to_partitioned(self, conn, schema: str, table: str, column: str):
+        """
+        Bảng heap → bảng PARTITION BY RANGE (column) cùng cấu trúc:
+        tạo partition DEFAULT + partition cho từng tháng đang có dữ liệu,
+        copy dữ liệu sang rồi drop bảng heap cũ (kèm index cũ).
+        """
+        logs.info(f"Migrating {schema}.{table} to monthly range partitions")
+        heap = f"{table}__heap"
+        col = quote_ident(column)
+
+        conn.execute(text(f"ALTER TABLE {schema}.{table} RENAME TO {heap}"))
+        conn.execute(text(
+            f"CREATE TABLE {schema}.{table} "
+            f"(LIKE {schema}.{heap} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({col})"
+        ))
+        conn.execute(text(
+            f"CREATE TABLE {schema}.{table}_default "
+            f"PARTITION OF {schema}.{table} DEFAULT"
+        ))
+
+        months = conn.execute(text(
+            f"SELECT DISTINCT date_trunc('month', {col}::date)::date "
+            f"FROM {schema}.{heap} WHERE {col} IS NOT NULL"
+        )).scalars().all()
+        for month in sorted(months):
+            self._ensure_range_partition(conn, schema, table, column, month)
+
+        conn.execute(text(
+            f"INSERT INTO {schema}.{table} SELECT * FROM {schema}.{heap}"
+        ))
+        conn.execute(text(f"DROP TABLE {schema}.{heap}"))
+
+        # unique index cũ nằm trên bảng heap → phải tạo lại
+        self._ensured_indexes = {
+            k for k in self._ensured_indexes if k[:2] != (schema, table)
+        }
+
+    @staticmethod
+    def _partition_months(df: pd.DataFrame, column: str) -> list[date]:
+        """Ngày đầu các tháng có dữ liệu trong frame."""
+        months = pd.to_datetime(df[column]).dt.to_period("M").dropna().unique()
+        return [month.start_time.date() for month in sorted(months)]
+
+    @staticmethod
+    def _partition_name(table: str, month_start: date) -> str:
+        return f"{table}_p{month_start:%Y_%m}"
+
+    def _ensure_range_partition(
+        self, conn, schema: str, table: str, column: str, month_start: date
+    ):
+        """
+        Partition [đầu tháng, đầu tháng sau). Dòng của tháng đó đang nằm
+        trong partition DEFAULT được chuyển sang trước rồi mới ATTACH.
+        """
+        cache_key = (schema, table, month_start)
+        if cache_key in self._ensured_partitions:
+            return
+
+        name = self._partition_name(table, month_start)
+        lower = month_start.isoformat()
+        upper = (month_start + timedelta(days=32)).replace(day=1).isoformat()
+
+        # nhiều run cùng tạo 1 partition → tuần tự hoá theo tên partition
+        conn.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext(:name))"),
+            {"name": f"{schema}.{name}"},
+        )
+        exists = conn.execute(
+            text("SELECT to_regclass(:name)"),
+            {"name": f"{schema}.{name}"},
+        ).scalar()
+
+        if not exists:
+            col = quote_ident(column)
+            conn.execute(text(
+                f"CREATE TABLE {schema}.{name} "
+                f"(LIKE {schema}.{table} INCLUDING DEFAULTS)"
+            ))
+            conn.execute(
+                text(f"""
+                    WITH moved AS (
+                        DELETE FROM {schema}.{table}_default
+                        WHERE {col} >= :lower AND {col} < :upper
+                        RETURNING *
+                    )
+                    INSERT INTO {schema}.{name} SELECT * FROM moved
+                """),
+                {"lower": lower, "upper": upper},
+            )
+            conn.execute(text(
+                f"ALTER TABLE {schema}.{table} ATTACH PARTITION {schema}.{name} "
+                f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+            ))
+
+        self._ensured_partitions.add(cache_key)
+
+    def _ensure_unique_index(self, conn, schema: str, table: str, unique_key):
+        """
+        Unique index trên unique_key để merge bằng ON CONFLICT (index probe)
+        thay vì hash join cả bảng. Lần đầu: xoá bản ghi trùng key đang có
+        (giữ bản ghi mới nhất theo ctid) rồi mới tạo index.
+        """
+        cache_key = (schema, table, tuple(unique_key))
+        if cache_key in self._ensured_indexes:
+            return
+
+        # đã có unique index / primary key đúng bộ cột này chưa
+        index_name = f"ux_{table}_{'_'.join(unique_key)}"[:63]
+        exists = conn.execute(
+            text(
+                "SELECT 1 FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indrelid "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = :schema AND c.relname = :table "
+                "AND i.indisunique "
+                "AND ARRAY("
+                "  SELECT a.attname::text COLLATE \"C\" "
+                "  FROM pg_attribute a "
+                "  WHERE a.attrelid = c.oid AND a.attnum = ANY(i.indkey) "
+                "  ORDER BY 1"
+                ") = :columns"
+            ),
+            {"schema": schema, "table": table, "columns": sorted(unique_key)},
+        ).first()
+
+        if not exists:
+            logs.info(f"Creating unique index {index_name} on {schema}.{table}")
+            dup_cond = " AND ".join(
+                [f"a.{quote_ident(c)} = b.{quote_ident(c)}" for c in unique_key]
+            )
+            conn.execute(text(f"""
+                DELETE FROM {schema}.{table} a
+                USING {schema}.{table} b
+                WHERE a.ctid < b.ctid AND {dup_cond}
+            """))
+
+            cols = ", ".join(quote_ident(c) for c in unique_key)
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} "
+                f"ON {schema}.{table} ({cols})"
+            ))
+
+        self._ensured_indexes.add(cache_key)
+
+    # =====================================================
+    # 🔹 HASH DIFF
+    # =====================================================
+    def _with_row_hash(self, df: pd.DataFrame, exclude=None) -> pd.DataFrame:
+        """
+        Thêm cột hash nội dung (vectorized, ổn định giữa các run) cho
+        từng dòng. Cột được sort theo tên để thứ tự cột không ảnh hưởng.
+        exclude: cột không tính vào hash (mặc định HASH_EXCLUDE).
+        """
+        exclude = set(self.HASH_EXCLUDE if exclude is None else exclude)
+        exclude.add(self.HASH_COLUMN)
+        columns = sorted(c for c in df.columns if c not in exclude)
+        hashes = pd.util.hash_pandas_object(df[columns], index=False)
+
+        df = df.copy()
+        # uint64 → BIGINT của Postgres
+        df[self.HASH_COLUMN] = hashes.to_numpy().view("int64")
+        return df
+
+    def _diff_rows(
+        self, conn, df, schema: str, table: str, unique_key=None, delete_missing=False
+    ):
+        """
+        So hash với bảng đích ngay trên server: COPY (unique_key…, _row_hash)
+        của frame vào staging rồi anti-join → chỉ giữ dòng mới / thay đổi.
+        delete_missing → xoá luôn các dòng trong bảng không còn trong frame
+        (kể cả dòng cũ chưa có hash).
+        """
+        hash_col = quote_ident(self.HASH_COLUMN)
+        key_cols = [c for c in (unique_key or []) if c != self.HASH_COLUMN]
+        # hash là key → đã có unique index trên _row_hash
+        if key_cols:
+            self._ensure_hash_index(conn, schema, table)
+
+        stage = f"__hash_{table}_{uuid.uuid4().hex[:8]}"
+        conn.execute(text(
+            f"CREATE UNLOGGED TABLE {schema}.{stage} AS "
+            f"SELECT {', '.join(quote_ident(c) for c in key_cols + [self.HASH_COLUMN])} "
+            f"FROM {schema}.{table} WITH NO DATA"
+        ))
+        self._copy_frame(conn, df[key_cols + [self.HASH_COLUMN]], schema, stage)
+        conn.execute(text(f"ANALYZE {schema}.{stage}"))
+
+        # hash chưa có trong bảng = dòng mới / đã đổi
+        changed_hashes = conn.execute(text(
+            f"SELECT s.{hash_col} FROM {schema}.{stage} s "
+            f"WHERE NOT EXISTS ("
+            f"  SELECT 1 FROM {schema}.{table} t "
+            f"  WHERE t.{hash_col} = s.{hash_col}"
+            f")"
+        )).scalars().all()
+        changed = df[df[self.HASH_COLUMN].isin(changed_hashes)]
+
+        deleted = 0
+        if delete_missing:
+            deleted = conn.execute(text(
+                f"DELETE FROM {schema}.{table} t "
+                f"WHERE t.{hash_col} IS NULL OR NOT EXISTS ("
+                f"  SELECT 1 FROM {schema}.{stage} s "
+                f"  WHERE s.{hash_col} = t.{hash_col}"
+                f")"
+            )).rowcount
+
+        conn.execute(text(f"DROP TABLE {schema}.{stage}"))
+
+        return changed, {
+            "rows_unchanged": len(df) - len(changed),
+            "rows_changed": len(changed),
+            "rows_deleted": deleted,
+        }
+
+    def _ensure_hash_index(self, conn, schema: str, table: str):
+        """Index thường trên _row_hash để anti-join là index probe."""
+        cache_key = (schema, table, "hash")
+        if cache_key in self._ensured_indexes:
+            return
+        hash_col = quote_ident(self.HASH_COLUMN)
+        index_name = f"ix_{table}_{self.HASH_COLUMN}"[:63]
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {quote_ident(index_name)} "
+            f"ON {schema}.{table} ({hash_col})"
+        ))
+        self._ensured_indexes.add(cache_key)
+
+    # =====================================================
+    # 🔹 COPY / MERGE
+    # =====================================================
+    def _load_frame(
+        self,
+        conn,
+        df: pd.DataFrame,
+        schema: str,
+        table: str,
+        unique_key=None,
+        partition_by=None,
+    ):
+        # COPY frame vào bảng staging UNLOGGED (không ghi WAL)
+        stage = f"__stage_{table}_{uuid.uuid4().hex[:8]}"
+        conn.execute(text(
+            f"CREATE UNLOGGED TABLE {schema}.{stage} "
+            f"(LIKE {schema}.{table} INCLUDING DEFAULTS)"
+        ))
+        self._copy_frame(conn, df, schema, stage)
+
+        # merge staging → bảng thật trong 1 câu lệnh
+        conn.execute(text(
+            self._merge_sql(schema, table, stage, df.columns, unique_key)
+        ))
+
+        # drop staging + cập nhật statistics cho planner
+        conn.execute(text(f"DROP TABLE {schema}.{stage}"))
+        for target in self._analyze_targets(df, table, partition_by):
+            conn.execute(text(f"ANALYZE {schema}.{target}"))
+
+    def _analyze_targets(self, df: pd.DataFrame, table: str, partition_by=None) -> list[str]:
+        """
+        Bảng cần ANALYZE sau khi load. Bảng partition: ANALYZE bảng cha sẽ
+        quét lại mọi partition → chỉ ANALYZE các partition tháng vừa ghi
+        (+ partition DEFAULT nếu có dòng thiếu giá trị partition key).
+        """
+        if not partition_by:
+            return [table]
+
+        targets = [
+            self._partition_name(table, month_start)
+            for month_start in self._partition_months(df, partition_by)
+        ]
+        if pd.to_datetime(df[partition_by]).isna().any():
+            targets.append(f"{table}_default")
+        return targets
+
+    def _copy_frame(self, conn, df: pd.DataFrame, schema: str, table: str):
+        """
+        Stream frame vào bảng bằng COPY FROM STDIN (CSV), từng chunk
+        `copy_chunk_rows` dòng để không phải giữ cả file CSV trong bộ nhớ.
+        """
+        columns = ", ".join(quote_ident(c) for c in df.columns)
+        copy_sql = (
+            f"COPY {schema}.{table} ({columns}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        )
+        chunk_rows = int(self._config.get("copy_chunk_rows", 100_000))
 
-                # 3) delete record trùng key trong bảng thật
-                join_cond = " AND ".join(
-                    [f"t.{c} = s.{c}" for c in unique_key]
+        # connection psycopg2 bên dưới SQLAlchemy (cùng transaction)
+        cursor = conn.connection.cursor()
+        try:
+            for start in range(0, len(df), chunk_rows):
+                buf = io.StringIO()
+                df.iloc[start:start + chunk_rows].to_csv(
+                    buf, index=False, header=False, na_rep="\\N"
                 )
+                buf.seek(0)
+                cursor.copy_expert(copy_sql, buf)
+        finally:
+            cursor.close()
 
-                delete_sql = f"""
-                    DELETE FROM {schema}.{table} t
-                    USING {schema}.{temp_table} s
-                    WHERE {join_cond}
-                """
-                conn.execute(text(delete_sql))
+    @staticmethod
+    def _merge_sql(schema, table, stage, columns, unique_key=None) -> str:
+        cols = ", ".join(quote_ident(c) for c in columns)
+        insert_sql = f"""
+            INSERT INTO {schema}.{table} ({cols})
+            SELECT {cols} FROM {schema}.{stage}
+        """
 
-                # 4) insert dữ liệu mới
-                insert_sql = f"""
-                    INSERT INTO {schema}.{table}
-                    SELECT * FROM {schema}.{temp_table}
-                """
-                conn.execute(text(insert_sql))
+        if not unique_key:
+            # fallback: append bình thường
+            return insert_sql
 
-                # 5) drop temp
-                conn.execute(text(f"DROP TABLE IF EXISTS {schema}.{temp_table}"))
+        # upsert theo unique index: trùng key → cập nhật các cột còn lại
+        conflict_cols = ", ".join(quote_ident(c) for c in unique_key)
+        update_cols = [c for c in columns if c not in unique_key]
+        if not update_cols:
+            return f"{insert_sql} ON CONFLICT ({conflict_cols}) DO NOTHING"
 
-        context.log.info(f"Done write {schema}.{table}, rows={len(obj)}")
\ No newline at end of file
+        assignments = ", ".join(
+            f"{quote_ident(c)} = EXCLUDED.{quote_ident(c)}" for c in update_cols
+        )
+        return f"""
+            {insert_sql}
+            ON CONFLICT ({conflict_cols}) DO UPDATE SET {assignments}
+        """
@@ -0,0 +1,227 @@
+from dataclasses import dataclass, field
+import json
+
+import numpy as np
+import pandas as pd
+
+
+# =====================================================
+# 🔹 KHAI BÁO SCHEMA
+# =====================================================
+# Kiểu cột viết đúng như format_type() của Postgres trả về
+# ("double precision", "timestamp without time zone", ...) để so sánh
+# trực tiếp với bảng đang có khi migrate.
+TEXT = "text"
+DATE = "date"
+TIMESTAMP = "timestamp without time zone"
+FLOAT = "double precision"
+INT = "integer"
+BIGINT = "bigint"
+BOOL = "boolean"
+JSONB = "jsonb"
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str
+    type: str
+    nullable: bool = True
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """
+    Schema khai báo của 1 bảng warehouse.
+
+    - columns: các cột có kiểu cố định; cột khác có trong frame (vd. các
+      chỉ số tính thêm) được suy kiểu từ dtype pandas và thêm vào bảng.
+    - primary_key: dùng làm unique_key khi asset không khai báo.
+    - indexes: index phụ, mỗi phần tử là 1 tuple cột.
+    - partition_by: cột date để partition theo tháng.
+    """
+
+    columns: tuple
+    primary_key: tuple = ()
+    indexes: tuple = field(default_factory=tuple)
+    partition_by: str | None = None
+
+    def column(self, name: str) -> Column | None:
+        for col in self.columns:
+            if col.name == name:
+                return col
+        return None
+
+
+_PRICE_CHANGE_COLUMNS = tuple(
+    Column(c, FLOAT)
+    for c in ("chg_1d", "chg_1w", "chg_1m", "chg_3m", "chg_6m", "chg_1y", "chg_3y")
+)
+
+WAREHOUSE_SCHEMAS = {
+    "warehouse.warehouse_prices_1d": TableSchema(
+        columns=(
+            Column("ticker", TEXT, nullable=False),
+            Column("date", DATE, nullable=False),
+            Column("high", FLOAT),
+            Column("low", FLOAT),
+            Column("open", FLOAT),
+            Column("close", FLOAT),
+            Column("volume", BIGINT),
+            Column("trading_floor", TEXT),
+            Column("market_cap", FLOAT),
+            Column("pe", FLOAT),
+            Column("pb", FLOAT),
+            *_PRICE_CHANGE_COLUMNS,
+        ),
+        primary_key=("ticker", "date"),
+        indexes=(("date",),),
+        partition_by="date",
+    ),
+    "warehouse.warehouse_news": TableSchema(
+        columns=(
+            Column("url", TEXT, nullable=False),
+            Column("title", TEXT),
+            Column("date_posted", DATE),
+            Column("ticker", TEXT),
+            Column("section", TEXT),
+            Column("tags", JSONB),
+            Column("summary", TEXT),
+            Column("source", TEXT),
+            Column("sentiment", TEXT),
+        ),
+        primary_key=("url",),
+        indexes=(("date_posted",), ("ticker", "date_posted")),
+    ),
+    "warehouse.warehouse_reports": TableSchema(
+        columns=(
+            Column("ticker", TEXT, nullable=False),
+            Column("year", INT, nullable=False),
+            Column("quarter", INT, nullable=False),
+            Column("report_type", TEXT),
+            Column("criteria", TEXT, nullable=False),
+            Column("value", FLOAT),
+        ),
+        primary_key=("ticker", "year", "quarter", "criteria"),
+        indexes=(("criteria", "year", "quarter"),),
+    ),
+    "warehouse.warehouse_ticker_metric": TableSchema(
+        columns=(
+            Column("ticker", TEXT, nullable=False),
+            Column("year", INT, nullable=False),
+            Column("quarter", INT, nullable=False),
+            Column("industry", TEXT),
+        ),
+        primary_key=("ticker", "year", "quarter"),
+        indexes=(("industry", "year", "quarter"),),
+    ),
+    # company_info: bảng snapshot, không có key tự nhiên (key = _row_hash)
+    "warehouse.warehouse_overview": TableSchema(
+        columns=(
+            Column("ticker", TEXT, nullable=False),
+            Column("name", TEXT),
+            Column("trading_floor", TEXT),
+            Column("industry", TEXT),
+            Column("subindustry", TEXT),
+            Column("history", TEXT),
+            Column("company_profile", TEXT),
+            Column("issue_share", FLOAT),
+            Column("cap_group", TEXT),
+            Column("date_fetched", TIMESTAMP),
+        ),
+        indexes=(("ticker",),),
+    ),
+    "warehouse.warehouse_events": TableSchema(
+        columns=(
+            Column("ticker", TEXT, nullable=False),
+            Column("event_title", TEXT),
+            Column("event_type", TEXT),
+            Column("ratio", FLOAT),
+            Column("value", FLOAT),
+            Column("public_date", DATE),
+            Column("issue_date", DATE),
+            Column("record_date", DATE),
+            Column("exright_date", DATE),
+        ),
+        indexes=(("ticker", "issue_date"),),
+    ),
+    "warehouse.warehouse_shareholders": TableSchema(
+        columns=(
+            Column("ticker", TEXT, nullable=False),
+            Column("share_holder", TEXT),
+            Column("quantity", FLOAT),
+            Column("share_own_percent", FLOAT),
+            Column("update_date", DATE),
+        ),
+        indexes=(("ticker",),),
+    ),
+    "warehouse.warehouse_officers": TableSchema(
+        columns=(
+            Column("ticker", TEXT, nullable=False),
+            Column("officer_name", TEXT),
+            Column("officer_position", TEXT),
+            Column("quantity", FLOAT),
+            Column("officer_own_percent", FLOAT),
+            Column("update_date", DATE),
+        ),
+        indexes=(("ticker",),),
+    ),
+}
+
+
+def get_table_schema(schema: str, table: str) -> TableSchema | None:
+    return WAREHOUSE_SCHEMAS.get(f"{schema}.{table}")
+
+
+# =====================================================
+# 🔹 KIỂU CỘT
+# =====================================================
+def infer_pg_type(dtype) -> str:
+    """
+    Kiểu Postgres cho cột không khai báo trong schema (theo dtype pandas).
+    """
+    if pd.api.types.is_bool_dtype(dtype):
+        return BOOL
+    if pd.api.types.is_integer_dtype(dtype):
+        return BIGINT
+    if pd.api.types.is_float_dtype(dtype):
+        return FLOAT
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return "timestamp with time zone"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return TIMESTAMP
+    return TEXT
+
+
+def _to_json(value):
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    # chuỗi JSON có sẵn / None / NaN giữ nguyên
+    return value
+
+
+def cast_frame(df: pd.DataFrame, table_schema: TableSchema) -> pd.DataFrame:
+    """
+    Ép các cột có khai báo về đúng kiểu trước khi load, để COPY không
+    phụ thuộc dtype mà run hiện tại sinh ra.
+    """
+    df = df.copy()
+
+    for col in table_schema.columns:
+        if col.name not in df.columns:
+            continue
+        s = df[col.name]
+
+        if col.type == DATE:
+            df[col.name] = pd.to_datetime(s, errors="coerce").dt.date
+        elif col.type == TIMESTAMP:
+            df[col.name] = pd.to_datetime(s, errors="coerce")
+        elif col.type == FLOAT:
+            df[col.name] = pd.to_numeric(s, errors="coerce").astype("float64")
+        elif col.type in (INT, BIGINT):
+            df[col.name] = pd.to_numeric(s, errors="coerce").round().astype("Int64")
+        elif col.type == JSONB:
+            df[col.name] = s.map(_to_json)
+
+    return df